@@ -1,5 +1,6 @@
-from fastapi import FastAPI, Depends, HTTPException, Header, Request
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
 import asyncpg
 from typing import Optional
@@ -7,25 +8,79 @@ import os
 import time
 import logging
 import secrets
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 
-from .db import get_pool
-from .auth import hash_password, verify_password, make_jwt, decode_jwt
+from .db import get_pool, warm_pool, close_pool, DB_DSN
+from .auth import (
+    hash_password_async, verify_password_async, make_jwt, decode_jwt_cached,
+    password_pool, calibrate_password_cost, needs_rehash,
+    new_refresh_token, hash_refresh_token, JWT_EXP_MIN
+)
 from .error_handling import (
     ErrorHandlingMiddleware, structured_logger, db_error_handler,
     security_logger, input_validator, get_correlation_id,
     validation_exception_handler, database_exception_handler,
-    create_error_response
+    overload_exception_handler, create_error_response, ServiceOverloadedError
 )
+from .metrics import registry
+from .listeners import NotificationListener
+from .user_cache import email_verified_cache, USER_CHANGED_CHANNEL
+from .write_behind import LastLoginWriter
+from .rate_limit import auth_rate_limiter, request_client_ip
+from .replica import ReplicaRouter
+from .partitions import EventPartitionMaintainer
+from .refresh_tokens import RefreshTokenPurger
+from .buy_batcher import MarketBuyBatcher
+from .catalog import ItemCatalog, ITEMS_CHANGED_CHANNEL
+from .idempotency import idempotency_cache
+from .market_cache import MarketSnapshotCache, MARKET_CHANGED_CHANNEL
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open and warm the database pool before serving, drain it on shutdown"""
+    app.state.pool = await get_pool()
+    # Everything after the pool exists is inside the try, so a failed startup still
+    # stops whatever was started and closes the pool; stop() is a no-op if never started
+    try:
+        await warm_pool(app.state.pool)
+        await item_catalog.load()
+
+        notification_listener.start()
+        last_login_writer.start()
+        auth_rate_limiter.start()
+        replica_router.start()
+        event_partition_maintainer.start()
+        refresh_token_purger.start()
+        rounds = await calibrate_password_cost(app.state.pool)
+        structured_logger.log_event("bcrypt_cost_selected", {"rounds": rounds})
+
+        yield
+    finally:
+        # Flush buffered writes before the pool goes away
+        await market_buy_batcher.stop()
+        await last_login_writer.stop()
+        await event_partition_maintainer.stop()
+        await refresh_token_purger.stop()
+        await auth_rate_limiter.stop()
+        await notification_listener.stop()
+        await replica_router.stop()
+        await close_pool(app.state.pool)
+        password_pool.shutdown()
 
 app = FastAPI(
     title="Dizzy's Disease API",
     version="1.0.0",
-    description="API for Dizzy's Disease survival RPG"
+    description="API for Dizzy's Disease survival RPG",
+    lifespan=lifespan
 )
 
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 RESET_TOKEN_TTL_MIN = int(os.getenv("RESET_TOKEN_TTL_MIN", "60"))
+MARKET_EVENTS_LOOKBACK_DAYS = int(os.getenv("MARKET_EVENTS_LOOKBACK_DAYS", "30"))
+MARKET_HISTORY_RESOLUTIONS = ("minute", "hour", "day")
+MARKET_HISTORY_MAX_LIMIT = int(os.getenv("MARKET_HISTORY_MAX_LIMIT", "1000"))
 
 # Configure structured logging
 logging.basicConfig(
@@ -51,14 +106,53 @@ app.add_middleware(
 # Add custom exception handlers
 app.add_exception_handler(ValueError, validation_exception_handler)
 app.add_exception_handler(asyncpg.PostgresError, database_exception_handler)
+app.add_exception_handler(ServiceOverloadedError, overload_exception_handler)
 
 START_TIME = time.time()
 
+notification_listener = NotificationListener(DB_DSN)
+notification_listener.subscribe(
+    USER_CHANGED_CHANNEL, email_verified_cache.invalidate, on_reset=email_verified_cache.clear
+)
+
 async def pool_dep() -> asyncpg.Pool:
-    if not hasattr(app.state, "pool"):
-        app.state.pool = await get_pool()
+    # Created by the lifespan handler before the first request is accepted
     return app.state.pool
 
+async def read_pool_dep() -> asyncpg.Pool:
+    # Replica when configured and within REPLICA_MAX_LAG_SECONDS, otherwise the primary
+    return replica_router.read_pool(app.state.pool)
+
+replica_router = ReplicaRouter(pool_dep)
+last_login_writer = LastLoginWriter(pool_dep)
+event_partition_maintainer = EventPartitionMaintainer(pool_dep)
+refresh_token_purger = RefreshTokenPurger(pool_dep)
+market_snapshot_cache = MarketSnapshotCache(read_pool_dep, pool_dep)
+market_buy_batcher = MarketBuyBatcher(pool_dep)
+item_catalog = ItemCatalog(pool_dep)
+notification_listener.subscribe(
+    MARKET_CHANGED_CHANNEL, market_snapshot_cache.invalidate, on_reset=market_snapshot_cache.clear
+)
+notification_listener.subscribe(
+    ITEMS_CHANGED_CHANNEL, item_catalog.invalidate, on_reset=item_catalog.invalidate
+)
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+def _conditional_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    # no-cache: clients may keep the body but must revalidate it on every poll
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/health")
 async def health_check(pool: asyncpg.Pool = Depends(pool_dep)):
     """Health check endpoint for monitoring"""
@@ -68,7 +162,8 @@ async def health_check(pool: asyncpg.Pool = Depends(pool_dep)):
         return {
             "status": "healthy",
             "uptime": time.time() - START_TIME,
-            "database": "connected"
+            "database": "connected",
+            "replica": replica_router.status()
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
@@ -84,12 +179,27 @@ async def version_info():
         "environment": os.getenv("ENVIRONMENT", "development")
     }
 
+@app.get("/stats")
+async def runtime_stats():
+    """Runtime counters for the API process (worker pools, caches, queues)"""
+    return {"uptime": time.time() - START_TIME, "metrics": registry.snapshot()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Same metrics as /stats in the Prometheus text exposition format"""
+    return PlainTextResponse(registry.render_prometheus(),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
 class RegisterIn(BaseModel):
     email: str
     password: str
     display_name: str
 
 
+class RefreshIn(BaseModel):
+    refresh_token: str
+
+
 class PasswordResetRequest(BaseModel):
     email: str
 
@@ -102,7 +212,8 @@ class PasswordResetConfirm(BaseModel):
 async def register(request: Request, data: RegisterIn, pool: asyncpg.Pool = Depends(pool_dep)):
     """User registration with comprehensive validation and logging"""
     correlation_id = get_correlation_id(request)
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = request_client_ip(request)
+    auth_rate_limiter.check("register", client_ip, data.email)
 
     # Input validation with business rules
     validation_errors = input_validator.validate_registration_data(
@@ -123,9 +234,10 @@ async def register(request: Request, data: RegisterIn, pool: asyncpg.Pool = Depe
             details={"validation_errors": validation_errors}
         )
 
+    pw = await hash_password_async(data.password)
+
     async with pool.acquire() as conn:
         try:
-            pw = hash_password(data.password)
             user = await conn.fetchrow(
                 """
                 INSERT INTO users(email, password_hash, display_name)
@@ -154,6 +266,7 @@ async def register(request: Request, data: RegisterIn, pool: asyncpg.Pool = Depe
             )
 
             token = make_jwt(user["user_id"], user["email"])  # type: ignore
+            refresh_token = await _issue_refresh_token(conn, user["user_id"])
             user_payload = {
                 "user_id": user["user_id"],
                 "email": user["email"],
@@ -164,7 +277,12 @@ async def register(request: Request, data: RegisterIn, pool: asyncpg.Pool = Depe
                 "email": user["email"]
             }, correlation_id=correlation_id)
 
-            return {"token": token, "user": user_payload}
+            return {
+                "token": token,
+                "refresh_token": refresh_token,
+                "expires_in": JWT_EXP_MIN * 60,
+                "user": user_payload
+            }
 
         except asyncpg.UniqueViolationError:
             # Log failed registration attempt
@@ -191,10 +309,16 @@ class LoginIn(BaseModel):
     password: str
 
 @app.post("/auth/login")
-async def login(request: Request, data: LoginIn, pool: asyncpg.Pool = Depends(pool_dep)):
+async def login(
+    request: Request,
+    data: LoginIn,
+    background_tasks: BackgroundTasks,
+    pool: asyncpg.Pool = Depends(pool_dep)
+):
     """User login with comprehensive security logging"""
     correlation_id = get_correlation_id(request)
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = request_client_ip(request)
+    auth_rate_limiter.check("login", client_ip, data.email)
 
     # Basic input validation
     if not data.email or not data.password:
@@ -209,72 +333,165 @@ async def login(request: Request, data: LoginIn, pool: asyncpg.Pool = Depends(po
         )
         raise HTTPException(status_code=400, detail="Email and password are required")
 
-    async with pool.acquire() as conn:
-        try:
-            user = await conn.fetchrow(
-                "SELECT user_id, email, display_name, password_hash FROM users WHERE email=$1",
-                data.email.lower().strip(),
-            )
-
-            if not user or not verify_password(data.password, user["password_hash"]):
-                # Log failed login attempt
-                security_logger.log_authentication_event(
-                    "login",
-                    user["user_id"] if user else None,
-                    data.email,
-                    False,
-                    correlation_id,
-                    client_ip,
-                    {"reason": "invalid_credentials"}
-                )
-                raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        async with pool.acquire() as conn:
+            user = await conn.fetchrow_named("user_by_email", data.email.lower().strip())
 
-            # Log successful login
+        # bcrypt runs on the password pool without holding a pooled connection
+        if not user or not await verify_password_async(data.password, user["password_hash"]):
+            # Log failed login attempt
             security_logger.log_authentication_event(
                 "login",
-                user["user_id"],
-                user["email"],
-                True,
+                user["user_id"] if user else None,
+                data.email,
+                False,
                 correlation_id,
-                client_ip
+                client_ip,
+                {"reason": "invalid_credentials"}
             )
+            raise HTTPException(status_code=401, detail="Invalid credentials")
 
-            await conn.execute(
-                "UPDATE users SET last_login=$1 WHERE user_id=$2",
-                datetime.now(timezone.utc),
-                user["user_id"]
+        # Log successful login
+        security_logger.log_authentication_event(
+            "login",
+            user["user_id"],
+            user["email"],
+            True,
+            correlation_id,
+            client_ip
+        )
+
+        # Flushed in batches by the write-behind writer, off the request path
+        last_login_writer.record(user["user_id"], datetime.now(timezone.utc))
+
+        if needs_rehash(user["password_hash"]):
+            background_tasks.add_task(
+                _rehash_password, pool, user["user_id"], data.password,
+                user["password_hash"], correlation_id
             )
 
-            token = make_jwt(user["user_id"], user["email"])
-            user_payload = {
-                "user_id": user["user_id"],
-                "email": user["email"],
-                "display_name": user["display_name"],
-            }
+        token = make_jwt(user["user_id"], user["email"])
+        async with pool.acquire() as conn:
+            refresh_token = await _issue_refresh_token(conn, user["user_id"])
+        user_payload = {
+            "user_id": user["user_id"],
+            "email": user["email"],
+            "display_name": user["display_name"],
+        }
 
-            structured_logger.log_event("user_logged_in", {
-                "user_id": user["user_id"],
-                "email": user["email"]
-            }, correlation_id=correlation_id)
+        structured_logger.log_event("user_logged_in", {
+            "user_id": user["user_id"],
+            "email": user["email"]
+        }, correlation_id=correlation_id)
 
-            return {"token": token, "user": user_payload}
+        return {
+            "token": token,
+            "refresh_token": refresh_token,
+            "expires_in": JWT_EXP_MIN * 60,
+            "user": user_payload
+        }
 
-        except HTTPException:
-            raise  # Re-raise HTTP exceptions
-        except Exception as e:
-            structured_logger.log_event("login_error", {
-                "error_type": type(e).__name__,
-                "error_message": str(e),
-                "email": data.email
-            }, level="ERROR", correlation_id=correlation_id)
-            raise HTTPException(status_code=500, detail="Login service temporarily unavailable")
+    except (HTTPException, ServiceOverloadedError):
+        raise  # Re-raise HTTP and load-shedding exceptions
+    except Exception as e:
+        structured_logger.log_event("login_error", {
+            "error_type": type(e).__name__,
+            "error_message": str(e),
+            "email": data.email
+        }, level="ERROR", correlation_id=correlation_id)
+        raise HTTPException(status_code=500, detail="Login service temporarily unavailable")
+
+
+async def _issue_refresh_token(conn: asyncpg.Connection, user_id: int,
+                               family_id: Optional[uuid.UUID] = None) -> str:
+    """Store the digest of a new refresh token and return the token itself"""
+    token, token_hash, expires_at = new_refresh_token()
+    await conn.execute(
+        """
+        INSERT INTO refresh_tokens (user_id, token_hash, family_id, expires_at)
+        VALUES ($1, $2, $3, $4)
+        """,
+        user_id, token_hash, family_id or uuid.uuid4(), expires_at
+    )
+    return token
+
+
+@app.post("/auth/refresh")
+async def refresh_session(request: Request, data: RefreshIn, pool: asyncpg.Pool = Depends(pool_dep)):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    correlation_id = get_correlation_id(request)
+    client_ip = request_client_ip(request)
+
+    token_hash = hash_refresh_token(data.refresh_token)
+    next_token, next_hash, next_expires_at = new_refresh_token()
+
+    async with pool.acquire() as conn:
+        # Revoke the presented token and issue its successor in one indexed round trip
+        user = await conn.fetchrow_named(
+            "refresh_token_rotate", token_hash, next_hash, next_expires_at
+        )
+
+        if not user:
+            # A revoked token being replayed means it leaked: revoke its whole family
+            revoked_family = await conn.fetchval_named("refresh_token_family_revoke", token_hash)
+            if revoked_family:
+                security_logger.log_security_violation(
+                    "refresh_token_reuse",
+                    None,
+                    correlation_id,
+                    {"client_ip": client_ip, "family_id": str(revoked_family)}
+                )
+            raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+
+    security_logger.log_authentication_event(
+        "token_refresh",
+        user["user_id"],
+        user["email"],
+        True,
+        correlation_id,
+        client_ip
+    )
+
+    return {
+        "token": make_jwt(user["user_id"], user["email"]),
+        "refresh_token": next_token,
+        "expires_in": JWT_EXP_MIN * 60,
+        "user": {
+            "user_id": user["user_id"],
+            "email": user["email"],
+            "display_name": user["display_name"],
+        }
+    }
+
+
+async def _rehash_password(pool: asyncpg.Pool, user_id: int, password: str,
+                           old_hash: str, correlation_id: str) -> None:
+    """Upgrade a stored hash to the current bcrypt cost after a successful login"""
+    try:
+        new_hash = await hash_password_async(password)
+        async with pool.acquire() as conn:
+            # Compare-and-set so a concurrent password reset is never overwritten
+            await conn.execute(
+                "UPDATE users SET password_hash=$1 WHERE user_id=$2 AND password_hash=$3",
+                new_hash, user_id, old_hash
+            )
+        structured_logger.log_event("password_rehashed", {
+            "user_id": user_id
+        }, correlation_id=correlation_id)
+    except Exception as e:
+        # Retried on the next successful login
+        structured_logger.log_event("password_rehash_failed", {
+            "user_id": user_id,
+            "error_type": type(e).__name__
+        }, level="WARNING", correlation_id=correlation_id)
 
 
 @app.post("/auth/request-reset")
 async def request_password_reset(request: Request, data: PasswordResetRequest, pool: asyncpg.Pool = Depends(pool_dep)):
     """Initiate password reset flow"""
     correlation_id = get_correlation_id(request)
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = request_client_ip(request)
+    auth_rate_limiter.check("request-reset", client_ip, data.email)
 
     email_error = input_validator.validate_email(data.email)
     if email_error:
@@ -338,7 +555,7 @@ async def request_password_reset(request: Request, data: PasswordResetRequest, p
 async def confirm_password_reset(request: Request, data: PasswordResetConfirm, pool: asyncpg.Pool = Depends(pool_dep)):
     """Confirm password reset using token"""
     correlation_id = get_correlation_id(request)
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = request_client_ip(request)
 
     password_error = input_validator.validate_password_strength(data.new_password)
     if password_error:
@@ -371,7 +588,9 @@ async def confirm_password_reset(request: Request, data: PasswordResetConfirm, p
             )
             raise HTTPException(status_code=400, detail="Invalid or expired reset token")
 
-        hashed = hash_password(data.new_password)
+    hashed = await hash_password_async(data.new_password)
+
+    async with pool.acquire() as conn:
         await conn.execute(
             """
             UPDATE users
@@ -381,6 +600,8 @@ async def confirm_password_reset(request: Request, data: PasswordResetConfirm, p
             hashed,
             user["user_id"]
         )
+        # A password reset ends every existing session
+        await conn.execute_named("refresh_tokens_revoke_user", user["user_id"])
 
     security_logger.log_authentication_event(
         "password_reset_confirm",
@@ -398,10 +619,14 @@ async def confirm_password_reset(request: Request, data: PasswordResetConfirm, p
 
     return {"message": "Password has been reset."}
 
-def auth_user(authorization: Optional[str] = Header(None)) -> int:
+async def auth_user(request: Request, authorization: Optional[str] = Header(None)) -> int:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
-    payload = decode_jwt(authorization.split(" ", 1)[1])
+    route = request.scope.get("route")
+    payload = decode_jwt_cached(
+        authorization.split(" ", 1)[1],
+        route.path if route is not None else request.url.path
+    )
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     return int(payload.get("sub"))
@@ -415,11 +640,17 @@ async def auth_user_verified(
     if ENVIRONMENT.lower() in ("development", "test"):
         return user_id
 
-    async with pool.acquire() as conn:
-        email_verified = await conn.fetchval(
-            "SELECT email_verified FROM users WHERE user_id = $1",
-            user_id
-        )
+    # The cache is only trusted while NOTIFY invalidations are being received
+    email_verified = None
+    if notification_listener.connected:
+        email_verified = email_verified_cache.get(user_id)
+
+    if email_verified is None:
+        generation = email_verified_cache.generation
+        async with pool.acquire() as conn:
+            email_verified = await conn.fetchval_named("user_email_verified", user_id)
+        if notification_listener.connected:
+            email_verified_cache.put(user_id, bool(email_verified), generation)
 
     if not email_verified:
         raise HTTPException(
@@ -430,13 +661,13 @@ async def auth_user_verified(
     return user_id
 
 @app.get("/market")
-async def market_list(settlement_id: int = 1, pool: asyncpg.Pool = Depends(pool_dep)):
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            "SELECT item_id, current_price, qty_available FROM market WHERE settlement_id=$1",
-            settlement_id,
-        )
-    return {"items": [dict(r) for r in rows]}
+async def market_list(
+    settlement_id: int = 1,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    # The cache is only trusted while NOTIFY invalidations are being received
+    snapshot = await market_snapshot_cache.get(settlement_id, use_cache=notification_listener.connected)
+    return _conditional_response(snapshot.market_body, snapshot.etag, if_none_match)
 
 class BuyIn(BaseModel):
     settlement_id: int
@@ -448,7 +679,6 @@ async def market_buy(
     request: Request,
     data: BuyIn,
     user_id: int = Depends(auth_user),
-    pool: asyncpg.Pool = Depends(pool_dep),
     x_request_id: Optional[str] = Header(None, alias="X-Request-Id")
 ):
     correlation_id = get_correlation_id(request)
@@ -463,6 +693,16 @@ async def market_buy(
             {"endpoint": "/market/buy", "client_ip": client_ip}
         )
         raise HTTPException(status_code=400, detail="X-Request-Id header required for idempotency")
+    try:
+        request_id = uuid.UUID(x_request_id)
+    except ValueError:
+        # Rejected here so one malformed id cannot fail a whole purchase batch
+        raise HTTPException(status_code=400, detail="X-Request-Id must be a UUID")
+
+    # Retries of a purchase this worker already answered are replayed from memory
+    replay = idempotency_cache.get(request_id, user_id)
+    if replay is not None:
+        return {**replay, "duplicate": True}
 
     # Comprehensive input validation for market transactions
     validation_errors = input_validator.validate_market_transaction(
@@ -483,52 +723,21 @@ async def market_buy(
             details={"validation_errors": validation_errors}
         )
 
-    async with pool.acquire() as conn:
-        # Check if this request was already processed (idempotency)
-        existing_order = await conn.fetchrow(
-            "SELECT * FROM orders WHERE request_id = $1",
-            x_request_id
-        )
-        if existing_order:
-            return {"ok": True, "order_id": existing_order["request_id"], "duplicate": True}
-
-        async with conn.transaction():
-            stock = await conn.fetchrow(
-                "SELECT current_price, qty_available FROM market WHERE settlement_id=$1 AND item_id=$2 FOR UPDATE",
-                data.settlement_id, data.item_id,
-            )
-            if not stock or stock["qty_available"] < data.quantity:
-                raise HTTPException(status_code=400, detail="Out of stock")
-            price = stock["current_price"] * data.quantity
-
-            # Deduct money and add inventory
-            wallet = await conn.fetchrow("SELECT character_id, money FROM characters WHERE user_id=$1 ORDER BY created_at LIMIT 1 FOR UPDATE", user_id)
-            if not wallet or wallet["money"] < price:
-                raise HTTPException(status_code=400, detail="Insufficient funds")
-
-            # Create idempotent order record first
-            try:
-                await conn.execute(
-                    """
-                    INSERT INTO orders (request_id, user_id, item_id, quantity, price, order_type)
-                    VALUES ($1, $2, $3, $4, $5, 'buy')
-                    ON CONFLICT (request_id) DO NOTHING
-                    """,
-                    x_request_id, user_id, data.item_id, data.quantity, price
-                )
-            except Exception:
-                # If insertion fails due to conflict, return success (idempotency)
-                return {"ok": True, "order_id": x_request_id, "duplicate": True}
-
-            # Process the transaction
-            await conn.execute("UPDATE characters SET money = money - $1 WHERE user_id=$2", price, user_id)
-            await conn.execute("UPDATE market SET qty_available = qty_available - $1 WHERE settlement_id=$2 AND item_id=$3", data.quantity, data.settlement_id, data.item_id)
-            await conn.execute("INSERT INTO inventories(character_id, item_id, quantity, durability_current) VALUES ($1, $2, $3, 100)", wallet["character_id"], data.item_id, data.quantity)
-
-            # Mark order as completed
-            await conn.execute("UPDATE orders SET completed = TRUE WHERE request_id = $1", x_request_id)
+    # Concurrent buys of the same item are applied together; idempotency, stock and
+    # funds are still decided per request, in arrival order
+    status, response = await market_buy_batcher.buy(
+        request_id, user_id, data.settlement_id, data.item_id, data.quantity
+    )
 
-    return {"ok": True, "order_id": x_request_id, "duplicate": False}
+    if status == "out_of_stock":
+        raise HTTPException(status_code=400, detail="Out of stock")
+    if status == "insufficient_funds":
+        raise HTTPException(status_code=400, detail="Insufficient funds")
+    if response is None:
+        # Another user's request id, or an order without a stored response
+        return {"ok": True, "order_id": x_request_id, "duplicate": True}
+    idempotency_cache.put(request_id, user_id, response)
+    return {**response, "duplicate": True} if status == "duplicate" else response
 
 class PerformanceReportIn(BaseModel):
     timestamp: float
@@ -571,13 +780,7 @@ async def performance_report(
         )
     async with pool.acquire() as conn:
         # Store performance data for analytics
-        await conn.execute(
-            """
-            INSERT INTO events (type, payload_json)
-            VALUES ('performance_report', $1)
-            """,
-            data.dict()
-        )
+        await conn.execute_named("event_insert", "performance_report", data.dict())
 
     # Log performance issues
     avg_fps = data.fps.get("average", 0)
@@ -645,29 +848,29 @@ async def process_market_event(
             correlation_id=correlation_id,
             details={"validation_errors": validation_errors}
         )
+    # Names the catalog does not know are skipped, as the per-name UPDATE used to
+    item_ids = await item_catalog.ids_for(data.price_changes)
+    new_prices = {
+        item_ids[item_name]: int(price_data["new"])
+        for item_name, price_data in data.price_changes.items()
+        if item_name in item_ids
+    }
+
     async with pool.acquire() as conn:
-        # Store the market event
-        await conn.execute(
-            """
-            INSERT INTO events (type, payload_json)
-            VALUES ('market_event', $1)
-            """,
-            data.dict()
-        )
+        # One transaction so snapshot readers never see half of an event's price changes
+        async with conn.transaction():
+            # Store the market event
+            await conn.execute_named(
+                "market_event_insert", data.settlement_id, data.event_type,
+                data.price_changes, data.timestamp
+            )
 
-        # Update market prices based on the event
-        for item_name, price_data in data.price_changes.items():
-            new_price = price_data["new"]
-            await conn.execute(
-                """
-                UPDATE market
-                SET current_price = $1
-                WHERE settlement_id = $2 AND item_id = (
-                    SELECT item_id FROM items WHERE name = $3
+            # Apply every price change in one statement
+            if new_prices:
+                await conn.execute_named(
+                    "market_prices_apply", data.settlement_id,
+                    list(new_prices.keys()), list(new_prices.values())
                 )
-                """,
-                int(new_price), data.settlement_id, item_name
-            )
 
         print(f"💰 Processed market event: {data.event_type} for settlement {data.settlement_id}")
 
@@ -676,92 +879,97 @@ async def process_market_event(
 @app.get("/market/prices")
 async def get_market_prices(
     settlement_id: int = 1,
-    pool: asyncpg.Pool = Depends(pool_dep)
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
 ):
-    """Get current market prices for a settlement"""
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT i.name, m.current_price, m.qty_available
-            FROM market m
-            JOIN items i ON m.item_id = i.item_id
-            WHERE m.settlement_id = $1
-            """,
-            settlement_id
-        )
-
-    prices = {}
-    items = []
-    for row in rows:
-        prices[row["name"]] = row["current_price"]
-        items.append({
-            "name": row["name"],
-            "price": row["current_price"],
-            "quantity": row["qty_available"]
-        })
-
-    return {
-        "prices": prices,
-        "items": items,
-        "settlement_id": settlement_id
-    }
+    """Get current market prices for a settlement; 304 while the client's ETag is current"""
+    snapshot = await market_snapshot_cache.get(settlement_id, use_cache=notification_listener.connected)
+    return _conditional_response(snapshot.prices_body, snapshot.etag, if_none_match)
 
 @app.get("/market/events")
 async def get_market_events(
     settlement_id: int = 1,
     limit: int = 10,
-    pool: asyncpg.Pool = Depends(pool_dep)
+    pool: asyncpg.Pool = Depends(read_pool_dep)
 ):
     """Get recent market events"""
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT type, payload_json, created_at
-            FROM events
-            WHERE type = 'market_event'
-            AND payload_json->>'settlement_id' = $1::text
-            ORDER BY created_at DESC
-            LIMIT $2
-            """,
-            str(settlement_id), limit
-        )
+        # Bounded lookback: the GET only ever shows recent activity
+        rows = await conn.fetch_named("market_events_recent", settlement_id, limit,
+                                      timedelta(days=MARKET_EVENTS_LOOKBACK_DAYS))
 
     events = []
     for row in rows:
         events.append({
-            "type": row["type"],
-            "data": row["payload_json"],
+            "type": "market_event",
+            "data": {
+                "event_type": row["event_type"],
+                "settlement_id": settlement_id,
+                "price_changes": row["price_changes"],
+                "timestamp": row["client_timestamp"]
+            },
             "timestamp": row["created_at"].timestamp()
         })
 
     return {"events": events, "settlement_id": settlement_id}
 
+@app.get("/market/history")
+async def get_market_history(
+    item_id: int,
+    settlement_id: int = 1,
+    resolution: str = "hour",
+    limit: int = 100,
+    pool: asyncpg.Pool = Depends(read_pool_dep)
+):
+    """OHLC price candles for one item, oldest first, read from the rollups"""
+    if resolution not in MARKET_HISTORY_RESOLUTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"resolution must be one of: {', '.join(MARKET_HISTORY_RESOLUTIONS)}"
+        )
+    if limit < 1 or limit > MARKET_HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MARKET_HISTORY_MAX_LIMIT}")
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch_named("market_history", settlement_id, item_id, resolution, limit)
+
+    candles = [
+        {
+            "timestamp": row["bucket"].timestamp(),
+            "open": row["open"],
+            "high": row["high"],
+            "low": row["low"],
+            "close": row["close"],
+            "ticks": row["ticks"]
+        }
+        for row in reversed(rows)
+    ]
+    return {
+        "settlement_id": settlement_id,
+        "item_id": item_id,
+        "resolution": resolution,
+        "candles": candles
+    }
+
+@app.get("/items")
+async def list_items(
+    type: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """Item catalog, optionally one type; the ETag is a hash of the body"""
+    await item_catalog.ready()
+    encoded = item_catalog.encoded(type)
+    return _conditional_response(encoded.body, encoded.etag, if_none_match)
+
 # Character Management Endpoints
 
 @app.get("/characters")
 async def get_characters(
     user_id: int = Depends(auth_user_verified),
-    pool: asyncpg.Pool = Depends(pool_dep)
+    pool: asyncpg.Pool = Depends(read_pool_dep)
 ):
     """Get all characters for the authenticated user"""
     async with pool.acquire() as conn:
-        characters = await conn.fetch(
-            """
-            SELECT 
-                character_id, name, level, xp, strength, dexterity, agility, 
-                endurance, accuracy, money, available_stat_points,
-                proficiency_melee, proficiency_axes_clubs, proficiency_pistols,
-                proficiency_rifles, proficiency_shotguns, proficiency_automatics,
-                survivability_health, survivability_stamina,
-                nourishment_level, sleep_level,
-                is_legacy_auto_created,
-                created_at
-            FROM characters 
-            WHERE user_id = $1 
-            ORDER BY created_at ASC
-            """,
-            user_id
-        )
+        characters = await conn.fetch_named("characters_by_user", user_id)
     
     return {
         "characters": [dict(char) for char in characters],
@@ -826,18 +1034,12 @@ async def create_character(
     
     async with pool.acquire() as conn:
         # Check character limit (max 5 per user)
-        char_count = await conn.fetchval(
-            "SELECT COUNT(*) FROM characters WHERE user_id = $1",
-            user_id
-        )
+        char_count = await conn.fetchval_named("character_count", user_id)
         if char_count >= 5:
             raise HTTPException(status_code=400, detail="Maximum 5 characters per account")
         
         # Check name uniqueness per user
-        existing = await conn.fetchrow(
-            "SELECT character_id FROM characters WHERE user_id = $1 AND name = $2",
-            user_id, name
-        )
+        existing = await conn.fetchrow_named("character_name_taken", user_id, name)
         if existing:
             raise HTTPException(status_code=409, detail="Character name already exists")
         
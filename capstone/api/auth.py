@@ -1,15 +1,46 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import hashlib
+import math
+import secrets
+import statistics
+import time
 import bcrypt
 import jwt
 import os
 
+from .error_handling import ServiceOverloadedError
+from .metrics import registry
+
 JWT_SECRET = os.getenv("JWT_SECRET", "devsecret")
 JWT_ALGO = "HS256"
-JWT_EXP_MIN = int(os.getenv("JWT_EXP_MIN", "60"))
+JWT_EXP_MIN = int(os.getenv("JWT_EXP_MIN", "60"))  # lower once the client renews via /auth/refresh
+REFRESH_TOKEN_TTL_DAYS = int(os.getenv("REFRESH_TOKEN_TTL_DAYS", "30"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))  # 0 disables the cache
+
+# Password hashing worker pool (bcrypt must never run on the event loop)
+PASSWORD_EXECUTOR = os.getenv("PASSWORD_EXECUTOR", "thread")  # "thread" or "process"
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "64"))
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_QUEUE_TIMEOUT", "5"))
+PASSWORD_SATURATION_STATUS = int(os.getenv("PASSWORD_SATURATION_STATUS", "503"))
+PASSWORD_RETRY_AFTER = int(os.getenv("PASSWORD_RETRY_AFTER", "2"))
+
+# bcrypt work factor: BCRYPT_ROUNDS pins it; otherwise the first instance to start calibrates
+# to BCRYPT_TARGET_MS and stores the result in password_settings for the whole cluster
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "15"))
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+BCRYPT_DEFAULT_ROUNDS = 12
 
-def hash_password(pw: str) -> str:
-    return bcrypt.hashpw(pw.encode(), bcrypt.gensalt()).decode()
+bcrypt_rounds = int(BCRYPT_ROUNDS) if BCRYPT_ROUNDS else BCRYPT_DEFAULT_ROUNDS
+
+def hash_password(pw: str, rounds: Optional[int] = None) -> str:
+    return bcrypt.hashpw(pw.encode(), bcrypt.gensalt(rounds=rounds or bcrypt_rounds)).decode()
 
 def verify_password(pw: str, hashed: str) -> bool:
     try:
@@ -17,6 +48,159 @@ def verify_password(pw: str, hashed: str) -> bool:
     except Exception:
         return False
 
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Work factor stored in a bcrypt hash ($2b$<rounds>$...)"""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def needs_rehash(hashed: str) -> bool:
+    # Upgrade only: a hash made at a higher cost is never weakened
+    return (hash_rounds(hashed) or 0) < bcrypt_rounds
+
+def measure_hash_seconds(rounds: int, samples: int = 2) -> float:
+    """Median wall time of one bcrypt hash at the given work factor"""
+    timings = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds=rounds))
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings)
+
+def calibrate_bcrypt_rounds(target_ms: float = BCRYPT_TARGET_MS,
+                            min_rounds: int = BCRYPT_MIN_ROUNDS,
+                            max_rounds: int = BCRYPT_MAX_ROUNDS) -> int:
+    """Largest work factor whose hash time stays at or under target_ms on this hardware"""
+    baseline = measure_hash_seconds(min_rounds)
+    # Each extra round doubles the cost, so extrapolate from the cheapest setting
+    extra = math.floor(math.log2(max(target_ms / 1000.0, baseline) / baseline))
+    rounds = max(min_rounds, min(max_rounds, min_rounds + extra))
+    if rounds > min_rounds and measure_hash_seconds(rounds) * 1000.0 > target_ms * 1.25:
+        rounds -= 1
+    return rounds
+
+
+class PasswordPoolSaturated(ServiceOverloadedError):
+    """Raised when the password worker pool cannot accept more work"""
+
+    error_code = "AUTH_BUSY"
+    message = "Authentication service is busy, please retry shortly"
+
+
+class PasswordWorkPool:
+    """Bounded executor for bcrypt work with queue-depth and wait-time metrics"""
+
+    def __init__(self, kind: str = PASSWORD_EXECUTOR, workers: int = PASSWORD_WORKERS,
+                 queue_max: int = PASSWORD_QUEUE_MAX, queue_timeout: float = PASSWORD_QUEUE_TIMEOUT,
+                 saturation_status: int = PASSWORD_SATURATION_STATUS,
+                 retry_after: int = PASSWORD_RETRY_AFTER):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self.saturation_status = saturation_status
+        self.retry_after = retry_after
+        self._executor: Optional[Executor] = None
+        self._slots = asyncio.Semaphore(self.workers)
+        self._waiting = 0
+        self._running = 0
+
+        self._wait_seconds = registry.histogram(
+            "password_pool_wait_seconds", "Time password jobs spend queued before a worker picks them up")
+        self._run_seconds = registry.histogram(
+            "password_pool_run_seconds", "Time spent hashing or verifying in a worker", ["operation"])
+        self._rejected = registry.counter(
+            "password_pool_rejected_total", "Password jobs rejected because the pool was saturated", ["reason"])
+        registry.gauge("password_pool_queue_depth", "Password jobs waiting for a worker",
+                       callback=lambda: self._waiting)
+        registry.gauge("password_pool_in_flight", "Password jobs currently running",
+                       callback=lambda: self._running)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="password")
+        return self._executor
+
+    def _saturated(self, reason: str) -> PasswordPoolSaturated:
+        self._rejected.inc(reason=reason)
+        return PasswordPoolSaturated(self.saturation_status, self.retry_after, reason)
+
+    async def run(self, operation: str, fn, *args):
+        """Run fn(*args) on a worker, rejecting instead of queueing without bound"""
+        queued_at = time.perf_counter()
+        if self._slots.locked():
+            if self._waiting >= self.queue_max:
+                raise self._saturated("queue_full")
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._saturated("queue_timeout")
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        started_at = time.perf_counter()
+        self._wait_seconds.observe(started_at - queued_at)
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._running -= 1
+            self._slots.release()
+            self._run_seconds.observe(time.perf_counter() - started_at, operation=operation)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordWorkPool()
+
+
+async def hash_password_async(pw: str) -> str:
+    # Pass the cost explicitly: process workers do not share the calibrated value
+    return await password_pool.run("hash", hash_password, pw, bcrypt_rounds)
+
+
+async def verify_password_async(pw: str, hashed: str) -> bool:
+    return await password_pool.run("verify", verify_password, pw, hashed)
+
+
+async def calibrate_password_cost(pool) -> int:
+    """Load the cluster-wide bcrypt work factor, calibrating and storing it if none is set yet.
+
+    BCRYPT_ROUNDS overrides both. Concurrent first starts may each calibrate, but only
+    one value is stored and every instance adopts it.
+    """
+    global bcrypt_rounds
+    if BCRYPT_ROUNDS:
+        return bcrypt_rounds
+    async with pool.acquire() as conn:
+        rounds = await conn.fetchval_named("bcrypt_rounds_get")
+    if rounds is None:
+        calibrated = await password_pool.run("calibrate", calibrate_bcrypt_rounds)
+        async with pool.acquire() as conn:
+            rounds = await conn.fetchval_named("bcrypt_rounds_pin", calibrated)
+        if rounds is None:
+            # Never leave the work factor unset; hash_password and needs_rehash need an int
+            rounds = calibrated
+    bcrypt_rounds = rounds
+    return bcrypt_rounds
+
+
+registry.gauge("bcrypt_rounds", "bcrypt work factor used for new password hashes",
+               callback=lambda: bcrypt_rounds)
+
+
 def make_jwt(user_id: int, email: str) -> str:
     exp = datetime.now(tz=timezone.utc) + timedelta(minutes=JWT_EXP_MIN)
     payload = {"sub": user_id, "email": email, "exp": exp}
@@ -28,3 +212,70 @@ def decode_jwt(token: str) -> Optional[dict]:
     except Exception:
         return None
 
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256-bit random values, so a fast digest is sufficient
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def new_refresh_token() -> Tuple[str, str, datetime]:
+    """Returns (token for the client, digest to store, expiry)"""
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.now(tz=timezone.utc) + timedelta(days=REFRESH_TOKEN_TTL_DAYS)
+    return token, hash_refresh_token(token), expires_at
+
+
+class TokenCache:
+    """LRU of verified JWT payloads keyed by token digest, evicted at the token's exp"""
+
+    def __init__(self, max_size: int = JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+
+        self._hits = registry.counter(
+            "jwt_cache_hits_total", "Authenticated requests served from the verified-token cache", ["route"])
+        self._misses = registry.counter(
+            "jwt_cache_misses_total", "Authenticated requests that had to verify the JWT", ["route"])
+        self._evictions = registry.counter(
+            "jwt_cache_evictions_total", "Tokens dropped from the cache", ["reason"])
+        self._decode_seconds = registry.histogram(
+            "jwt_decode_seconds", "Time spent parsing and verifying a JWT on a cache miss",
+            buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005))
+        registry.gauge("jwt_cache_entries", "Verified tokens currently cached",
+                       callback=lambda: len(self._entries))
+
+    def decode(self, token: str, route: str = "") -> Optional[dict]:
+        """Return the verified payload for token, verifying only on a cache miss"""
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            exp, payload = entry
+            if time.time() < exp:
+                self._entries.move_to_end(key)
+                self._hits.inc(route=route)
+                return payload
+            del self._entries[key]
+            self._evictions.inc(reason="expired")
+
+        self._misses.inc(route=route)
+        started_at = time.perf_counter()
+        payload = decode_jwt(token)
+        self._decode_seconds.observe(time.perf_counter() - started_at)
+        if payload is None:
+            return None
+
+        exp = payload.get("exp")
+        if self.max_size > 0 and isinstance(exp, (int, float)):
+            self._entries[key] = (float(exp), payload)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions.inc(reason="capacity")
+        return payload
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def decode_jwt_cached(token: str, route: str = "") -> Optional[dict]:
+    return token_cache.decode(token, route)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+bcrypt throughput benchmark for Dizzy's Disease API
+Reports hashes/sec (total and per core) at each work factor, plus the
+cost the startup calibration would pick on this machine.
+
+Usage: python -m api.benchmarks.bcrypt_cost [--min-rounds 8] [--max-rounds 14] [--workers N]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from api.auth import BCRYPT_TARGET_MS, calibrate_bcrypt_rounds, hash_password
+
+
+def _hash_for(rounds: int, duration: float) -> int:
+    """Hash repeatedly for duration seconds in one process; returns hashes completed"""
+    completed = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline or completed == 0:
+        hash_password("Benchmark123!", rounds)
+        completed += 1
+    return completed
+
+
+def run_benchmark(min_rounds: int, max_rounds: int, workers: int, duration: float):
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rounds in range(min_rounds, max_rounds + 1):
+            started_at = time.perf_counter()
+            counts = list(executor.map(_hash_for, [rounds] * workers, [duration] * workers))
+            elapsed = time.perf_counter() - started_at
+            total = sum(counts)
+            results.append({
+                "rounds": rounds,
+                "hashes": total,
+                "hashes_per_sec": total / elapsed,
+                "hashes_per_sec_per_core": total / elapsed / workers,
+                "ms_per_hash": elapsed * 1000.0 * workers / total,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bcrypt hashes/sec per work factor")
+    parser.add_argument("--min-rounds", type=int, default=8)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=2.0,
+                        help="seconds spent hashing at each cost")
+    args = parser.parse_args()
+
+    print(f"bcrypt benchmark: {args.workers} worker process(es), {args.duration:.1f}s per cost")
+    print(f"{'rounds':>6} {'hashes':>8} {'hash/s':>10} {'hash/s/core':>12} {'ms/hash':>9}")
+    for row in run_benchmark(args.min_rounds, args.max_rounds, args.workers, args.duration):
+        print(f"{row['rounds']:>6} {row['hashes']:>8} {row['hashes_per_sec']:>10.1f} "
+              f"{row['hashes_per_sec_per_core']:>12.2f} {row['ms_per_hash']:>9.1f}")
+
+    print(f"Calibrated cost for {BCRYPT_TARGET_MS:.0f} ms target: {calibrate_bcrypt_rounds()}")
+
+
+if __name__ == "__main__":
+    main()
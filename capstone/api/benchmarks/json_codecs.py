@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+JSON/JSONB codec benchmark for Dizzy's Disease API
+Encode/decode throughput of the pool's jsonb codec on performance-report payloads
+shaped like the ones PerformanceMonitor.gd sends, orjson vs the stdlib fallback.
+
+Usage: python -m api.benchmarks.json_codecs [--iterations 200000]
+"""
+import argparse
+import json
+import random
+import time
+
+from api.db import orjson, _jsonb_decode, _jsonb_encode
+
+
+def performance_report(rng: random.Random) -> dict:
+    avg_fps = rng.uniform(25.0, 144.0)
+    return {
+        "timestamp": time.time(),
+        "duration_seconds": 30.0,
+        "fps": {
+            "average": avg_fps,
+            "minimum": avg_fps * rng.uniform(0.5, 0.95),
+            "maximum": avg_fps * rng.uniform(1.05, 1.5),
+            "samples": 30
+        },
+        "memory": {
+            "average_mb": rng.uniform(180.0, 900.0),
+            "maximum_mb": rng.uniform(900.0, 1400.0),
+            "samples": 30
+        },
+        "npcs": {"count": rng.randint(0, 40), "target": 5},
+        "performance": {"rating": rng.choice(["excellent", "good", "fair", "poor"]),
+                        "meets_gate2_requirements": avg_fps >= 30.0},
+        "platform": rng.choice(["Windows", "Linux", "macOS", "Web"]),
+        "renderer": rng.choice(["forward_plus", "mobile", "gl_compatibility"])
+    }
+
+
+def _codecs():
+    # The pool's binary jsonb codec, and the text codec used when orjson is missing
+    codecs = {"stdlib": (json.dumps, json.loads)}
+    if orjson is not None:
+        codecs["orjson"] = (_jsonb_encode, _jsonb_decode)
+    return codecs
+
+
+def run_benchmark(iterations: int, seed: int = 7):
+    rng = random.Random(seed)
+    payloads = [performance_report(rng) for _ in range(1000)]
+    results = []
+    for name, (encode, decode) in _codecs().items():
+        started_at = time.perf_counter()
+        for i in range(iterations):
+            encode(payloads[i % len(payloads)])
+        encode_seconds = time.perf_counter() - started_at
+
+        encoded = [encode(payload) for payload in payloads]
+        started_at = time.perf_counter()
+        for i in range(iterations):
+            decode(encoded[i % len(encoded)])
+        decode_seconds = time.perf_counter() - started_at
+
+        results.append({
+            "codec": name,
+            "encode_per_sec": iterations / encode_seconds,
+            "decode_per_sec": iterations / decode_seconds,
+            "bytes": sum(len(data) for data in encoded) / len(encoded),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="jsonb codec throughput on performance reports")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson not installed: only the stdlib fallback is measured")
+    print(f"{'codec':>8} {'encode/s':>12} {'decode/s':>12} {'bytes':>7}")
+    for row in run_benchmark(args.iterations):
+        print(f"{row['codec']:>8} {row['encode_per_sec']:>12.0f} {row['decode_per_sec']:>12.0f} "
+              f"{row['bytes']:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Group commit for market purchases in Dizzy's Disease API
+Concurrent buys of the same (settlement, item) share one market_buy_batch() call
+instead of queueing one by one on that market row's lock
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from .error_handling import structured_logger
+from .metrics import registry
+
+BUY_BATCH_WINDOW_MS = float(os.getenv("BUY_BATCH_WINDOW_MS", "2"))  # 0 sends every buy on its own
+BUY_BATCH_MAX_SIZE = int(os.getenv("BUY_BATCH_MAX_SIZE", "64"))
+
+BatchKey = Tuple[int, int]
+# (status, response body): the body is set for 'ok', and for a 'duplicate' of the caller's own order
+BuyResult = Tuple[str, Optional[dict]]
+
+
+class _PendingBuy:
+    __slots__ = ("request_id", "user_id", "quantity", "future")
+
+    def __init__(self, request_id: uuid.UUID, user_id: int, quantity: int, future: asyncio.Future):
+        self.request_id = request_id
+        self.user_id = user_id
+        self.quantity = quantity
+        self.future = future
+
+
+class MarketBuyBatcher:
+    """Collects buys per (settlement_id, item_id) for up to window seconds, then applies them together.
+
+    A batch closes when its window elapses or it reaches max_size. Batches for one key
+    run one after another, so a hot item holds one pool connection rather than one per
+    buyer. Every request still gets its own market_buy() status, and a request id that
+    was already processed, in an earlier batch or earlier in the same one, is a duplicate.
+    If the batch call raises, nothing was applied and each member is retried on its own
+    through market_buy(), so only the request that caused the error fails.
+    """
+
+    def __init__(self, pool_getter: Callable[[], Awaitable[asyncpg.Pool]],
+                 window: float = BUY_BATCH_WINDOW_MS / 1000.0,
+                 max_size: int = BUY_BATCH_MAX_SIZE):
+        self._pool_getter = pool_getter
+        self.window = window
+        self.max_size = max_size
+        self._open: Dict[BatchKey, List[_PendingBuy]] = {}
+        self._timers: Dict[BatchKey, asyncio.TimerHandle] = {}
+        self._running: Dict[BatchKey, asyncio.Task] = {}
+
+        self._batch_size = registry.histogram(
+            "market_buy_batch_size", "Purchases applied per market_buy_batch call",
+            buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+        self._batch_seconds = registry.histogram(
+            "market_buy_batch_seconds", "Latency of one market_buy_batch call")
+        self._failures = registry.counter(
+            "market_buy_batch_failures_total", "Batches whose call raised and were retried one buy at a time")
+
+    async def buy(self, request_id: uuid.UUID, user_id: int, settlement_id: int,
+                  item_id: int, quantity: int) -> BuyResult:
+        """Status is 'ok', 'duplicate', 'out_of_stock' or 'insufficient_funds'"""
+        if self.window <= 0:
+            pool = await self._pool_getter()
+            async with pool.acquire() as conn:
+                return await self._buy_one(conn, request_id, user_id, settlement_id, item_id, quantity)
+
+        key = (settlement_id, item_id)
+        loop = asyncio.get_running_loop()
+        pending = _PendingBuy(request_id, user_id, quantity, loop.create_future())
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = []
+            self._timers[key] = loop.call_later(self.window, self._close, key)
+        batch.append(pending)
+        if len(batch) >= self.max_size:
+            self._close(key)
+        return await pending.future
+
+    def _close(self, key: BatchKey) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._open.pop(key, None)
+        if not batch:
+            return
+        task = asyncio.create_task(self._execute(key, batch, self._running.get(key)))
+        self._running[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+
+    def _finished(self, key: BatchKey, task: asyncio.Task) -> None:
+        if self._running.get(key) is task:
+            del self._running[key]
+
+    async def _execute(self, key: BatchKey, batch: List[_PendingBuy],
+                       previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        settlement_id, item_id = key
+        started_at = time.perf_counter()
+        rows = None
+        try:
+            pool = await self._pool_getter()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch_named(
+                    "market_buy_batch", settlement_id, item_id,
+                    [p.request_id for p in batch], [p.user_id for p in batch],
+                    [p.quantity for p in batch]
+                )
+        except Exception as e:
+            self._failures.inc()
+            structured_logger.log_event("market_buy_batch_failed", {
+                "settlement_id": settlement_id,
+                "item_id": item_id,
+                "batch_size": len(batch),
+                "error_type": type(e).__name__,
+                "error_message": str(e)
+            }, level="ERROR")
+        finally:
+            self._batch_seconds.observe(time.perf_counter() - started_at)
+
+        if rows is None:
+            # The batch rolled back as a whole; retry each buy alone so only the bad one fails
+            await self._execute_one_by_one(key, batch)
+            return
+
+        self._batch_size.observe(len(batch))
+        for row in rows:
+            future = batch[row["batch_position"] - 1].future
+            if not future.done():
+                future.set_result((row["status"], row["response"]))
+
+    async def _execute_one_by_one(self, key: BatchKey, batch: List[_PendingBuy]) -> None:
+        settlement_id, item_id = key
+        try:
+            pool = await self._pool_getter()
+            async with pool.acquire() as conn:
+                for pending in batch:
+                    try:
+                        result = await self._buy_one(conn, pending.request_id, pending.user_id,
+                                                     settlement_id, item_id, pending.quantity)
+                    except Exception as e:
+                        if not pending.future.done():
+                            pending.future.set_exception(e)
+                    else:
+                        if not pending.future.done():
+                            pending.future.set_result(result)
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+
+    @staticmethod
+    async def _buy_one(conn, request_id: uuid.UUID, user_id: int, settlement_id: int,
+                       item_id: int, quantity: int) -> BuyResult:
+        row = await conn.fetchrow_named(
+            "market_buy", request_id, user_id, settlement_id, item_id, quantity)
+        return row["status"], row["response"]
+
+    async def stop(self) -> None:
+        """Apply every open batch now and wait for in-flight ones before the pool closes"""
+        for key in list(self._open):
+            self._close(key)
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
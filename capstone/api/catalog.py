@@ -0,0 +1,158 @@
+"""
+Per-process item catalog for Dizzy's Disease API
+The items table, loaded at startup into compact records indexed by id, name and type,
+served pre-encoded by /items and reloaded when the items_notify_changed trigger fires
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import asyncpg
+
+from .db import orjson
+from .error_handling import structured_logger
+from .metrics import registry
+
+# Unknown names trigger a reload, but no more often than this
+ITEM_CATALOG_MIN_RELOAD_INTERVAL = float(os.getenv("ITEM_CATALOG_MIN_RELOAD_INTERVAL", "5"))
+
+ITEMS_CHANGED_CHANNEL = "items_changed"
+
+
+def _encode(body: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(body)
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+class Item:
+    """One items row"""
+
+    __slots__ = ("item_id", "name", "type", "slot_size", "weight", "durability_max",
+                 "armor_dr", "damage", "noise", "noise_radius")
+
+    def __init__(self, row):
+        for field in self.__slots__:
+            setattr(self, field, row[field])
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class EncodedItems:
+    """A list of items encoded once, with an ETag derived from the encoded bytes"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, items: Iterable[Item]):
+        self.body = _encode({"items": [item.as_dict() for item in items]})
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+
+class ItemCatalog:
+    """Items indexed by id, name and type.
+
+    Readers always see a complete catalog: a reload builds new indexes and swaps
+    them in at once. A NOTIFY (or a LISTEN reconnect) reloads in the background.
+    Loads can overlap (a background reload and an unknown-name lookup); each one is
+    numbered when its query is sent, and a result older than the catalog already
+    in place is discarded.
+    """
+
+    def __init__(self, pool_getter: Callable[[], Awaitable[asyncpg.Pool]],
+                 min_reload_interval: float = ITEM_CATALOG_MIN_RELOAD_INTERVAL):
+        self._pool_getter = pool_getter
+        self.min_reload_interval = min_reload_interval
+        self.by_id: Dict[int, Item] = {}
+        self.by_name: Dict[str, Item] = {}
+        self.by_type: Dict[str, Tuple[Item, ...]] = {}
+        self._encoded: Dict[Optional[str], EncodedItems] = {}
+        self._loaded_at: Optional[float] = None
+        self._load_generation = 0
+        self._loaded_generation = 0
+        self._stale = False
+        self._reloading: Optional[asyncio.Task] = None
+
+        self._loads = registry.counter("item_catalog_loads_total", "Item catalog reloads from the database")
+        self._failures = registry.counter(
+            "item_catalog_load_failures_total", "Background item catalog reloads that raised")
+        registry.gauge("item_catalog_items", "Items in the in-memory catalog",
+                       callback=lambda: len(self.by_id))
+
+    async def load(self) -> None:
+        pool = await self._pool_getter()
+        async with pool.acquire() as conn:
+            self._load_generation += 1
+            generation = self._load_generation
+            rows = await conn.fetch_named("item_catalog")
+        if generation < self._loaded_generation:
+            # A load that queried later has already been swapped in
+            return
+
+        items = [Item(row) for row in rows]
+        by_name: Dict[str, Item] = {}
+        grouped: Dict[str, list] = {}
+        for item in items:
+            # Names are not constrained unique; the lowest id wins, as ORDER BY item_id gives
+            by_name.setdefault(item.name, item)
+            grouped.setdefault(item.type, []).append(item)
+        encoded: Dict[Optional[str], EncodedItems] = {None: EncodedItems(items)}
+        for item_type, typed in grouped.items():
+            encoded[item_type] = EncodedItems(typed)
+
+        self.by_id = {item.item_id: item for item in items}
+        self.by_name = by_name
+        self.by_type = {item_type: tuple(typed) for item_type, typed in grouped.items()}
+        self._encoded = encoded
+        self._loaded_at = time.monotonic()
+        self._loaded_generation = generation
+        self._loads.inc()
+
+    async def ready(self) -> None:
+        """Load on first use; afterwards only restart a reload that failed"""
+        if self._loaded_at is None:
+            await self.load()
+        elif self._stale and (self._reloading is None or self._reloading.done()):
+            self._reloading = asyncio.ensure_future(self._reload())
+
+    def encoded(self, item_type: Optional[str] = None) -> EncodedItems:
+        """The whole catalog, or one type of item, as a pre-encoded /items body"""
+        encoded = self._encoded.get(item_type)
+        if encoded is None:
+            encoded = EncodedItems(())
+        return encoded
+
+    async def ids_for(self, names: Iterable[str]) -> Dict[str, int]:
+        """Map the known names to item ids; unknown names are left out"""
+        await self.ready()
+        names = list(names)
+        if (any(name not in self.by_name for name in names)
+                and time.monotonic() - self._loaded_at >= self.min_reload_interval):
+            await self.load()
+        by_name = self.by_name
+        return {name: by_name[name].item_id for name in names if name in by_name}
+
+    def invalidate(self, payload: str = "") -> None:
+        """NOTIFY and listener-reset handler; the current catalog is served until the reload lands"""
+        self._stale = True
+        if self._reloading is None or self._reloading.done():
+            self._reloading = asyncio.ensure_future(self._reload())
+
+    async def _reload(self) -> None:
+        # Loop so a change notified while a load is running is not missed
+        while self._stale:
+            self._stale = False
+            try:
+                await self.load()
+            except Exception as e:
+                self._stale = True
+                self._failures.inc()
+                structured_logger.log_event("item_catalog_reload_failed", {
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }, level="ERROR")
+                return
@@ -1,13 +1,158 @@
+import asyncio
 import asyncpg
+import json
 import os
+import time
+from typing import Dict
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback keeps the API importable without the wheel
+    orjson = None
+
+from .metrics import registry
+from .statements import PreparedConnection, init_connection, STATEMENTS
 
 DB_DSN = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/dizzy")
 
-async def get_pool():
-    return await asyncpg.create_pool(dsn=DB_DSN, min_size=1, max_size=10)
+# Pool sizing and connection lifecycle
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_POOL_CLOSE_TIMEOUT = float(os.getenv("DB_POOL_CLOSE_TIMEOUT", "10"))
+
+_acquire_seconds = registry.histogram(
+    "db_pool_acquire_seconds", "Time spent waiting in pool.acquire()", ["pool"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+_acquire_timeouts = registry.counter(
+    "db_pool_acquire_failures_total", "pool.acquire() calls that timed out or failed", ["pool"])
+
+# Live pools by name, read by the size gauges at scrape time
+_pools: Dict[str, "InstrumentedPool"] = {}
+
+registry.gauge("db_pool_size", "Open connections in the pool", ["pool"],
+               callback=lambda: {(name, ): pool.get_size() for name, pool in _pools.items()})
+registry.gauge("db_pool_idle", "Open connections not checked out", ["pool"],
+               callback=lambda: {(name, ): pool.get_idle_size() for name, pool in _pools.items()})
+registry.gauge("db_pool_in_use", "Connections currently checked out", ["pool"],
+               callback=lambda: {(name, ): pool.get_size() - pool.get_idle_size()
+                                 for name, pool in _pools.items()})
+registry.gauge("db_pool_max_size", "Configured pool ceiling", ["pool"],
+               callback=lambda: {(name, ): pool.get_max_size() for name, pool in _pools.items()})
+
+
+class _TimedAcquire:
+    """Mirror of asyncpg's PoolAcquireContext that records how long the caller waited"""
+
+    def __init__(self, pool: "InstrumentedPool", timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    async def _acquire(self):
+        started_at = time.perf_counter()
+        try:
+            return await self._pool.pool.acquire(timeout=self._timeout)
+        except Exception:
+            _acquire_timeouts.inc(pool=self._pool.name)
+            raise
+        finally:
+            _acquire_seconds.observe(time.perf_counter() - started_at, pool=self._pool.name)
+
+    async def __aenter__(self):
+        self._conn = await self._acquire()
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        conn, self._conn = self._conn, None
+        await self._pool.pool.release(conn)
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+
+class InstrumentedPool:
+    """asyncpg.Pool wrapper that times acquire() and exposes size gauges; everything else is delegated"""
+
+    def __init__(self, pool: asyncpg.Pool, name: str):
+        self.pool = pool
+        self.name = name
+        _pools[name] = self
+
+    def acquire(self, *, timeout=None) -> _TimedAcquire:
+        return _TimedAcquire(self, timeout)
+
+    async def close(self):
+        _pools.pop(self.name, None)
+        await self.pool.close()
+
+    def terminate(self):
+        _pools.pop(self.name, None)
+        self.pool.terminate()
+
+    def __getattr__(self, attr):
+        return getattr(self.pool, attr)
+
+
+def _orjson_dumps(value) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+def _jsonb_encode(value) -> bytes:
+    # JSONB binary wire format: version byte 1, then the JSON text
+    return b"\x01" + _orjson_dumps(value)
+
+def _jsonb_decode(data: bytes):
+    return orjson.loads(data[1:])
+
+async def register_json_codecs(conn):
+    """Map json/jsonb to Python objects: parameters take dicts/lists, results come back decoded"""
+    if orjson is not None:
+        await conn.set_type_codec("jsonb", schema="pg_catalog", format="binary",
+                                  encoder=_jsonb_encode, decoder=_jsonb_decode)
+        await conn.set_type_codec("json", schema="pg_catalog", format="binary",
+                                  encoder=_orjson_dumps, decoder=orjson.loads)
+    else:
+        for type_name in ("jsonb", "json"):
+            await conn.set_type_codec(type_name, schema="pg_catalog", format="text",
+                                      encoder=json.dumps, decoder=json.loads)
+
+async def setup_connection(conn):
+    # Codecs first: setting a codec drops the connection's statement cache
+    await register_json_codecs(conn)
+    await init_connection(conn)
+
+async def get_pool(dsn: str = DB_DSN, name: str = "primary"):
+    # create_pool opens min_size connections before returning
+    pool = await asyncpg.create_pool(
+        dsn=dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+        # Leave room for ad-hoc queries so registry statements are never evicted
+        statement_cache_size=max(DB_STATEMENT_CACHE_SIZE, 2 * len(STATEMENTS)),
+        connection_class=PreparedConnection,
+        init=setup_connection,
+    )
+    return InstrumentedPool(pool, name)
+
+async def warm_pool(pool):
+    """Round-trip on min_size connections so the first requests never pay connection setup"""
+    connections = await asyncio.gather(*(pool.acquire() for _ in range(pool.get_min_size())))
+    try:
+        await asyncio.gather(*(conn.fetchval("SELECT 1") for conn in connections))
+    finally:
+        for conn in connections:
+            await pool.release(conn)
+
+async def close_pool(pool, timeout: float = DB_POOL_CLOSE_TIMEOUT):
+    """Wait for in-flight queries to release their connections, then force-close stragglers"""
+    try:
+        await asyncio.wait_for(pool.close(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pool.terminate()
 
 async def init_db(pool):
     async with pool.acquire() as conn:
         sql = (await (await conn.prepare("SELECT 1")).fetch())[0]
         return sql
-
@@ -7,6 +7,7 @@ import json
 import time
 import uuid
 import logging
+from contextvars import ContextVar
 from datetime import datetime
 from typing import Dict, Any, Optional
 from fastapi import Request, Response, HTTPException
@@ -14,6 +15,8 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 import asyncpg
 
+from .metrics import registry
+
 PASSWORD_SYMBOLS = set("!@#$%^&*()-_=+[]{}|;:'\",.<>/?`~")
 COMMON_PASSWORDS = {
     "password",
@@ -63,6 +66,39 @@ class StructuredLogger:
             self.logger.debug(log_message)
 
 
+class RequestDbStats:
+    """Database work done on behalf of one request, accumulated by pooled connections"""
+
+    __slots__ = ("correlation_id", "queries", "rows", "seconds")
+
+    def __init__(self, correlation_id: str):
+        self.correlation_id = correlation_id
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    def as_log_fields(self) -> Dict[str, Any]:
+        return {
+            "db_time_ms": round(self.seconds * 1000, 2),
+            "db_queries": self.queries,
+            "db_rows": self.rows
+        }
+
+
+# Set by ErrorHandlingMiddleware; None outside a request (background tasks, startup)
+request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"])
+
+
+def _observe_request(request: Request, status_code: int, duration: float) -> None:
+    # Label by route template (/characters/{character_id}), never the raw path
+    route = request.scope.get("route")
+    _request_seconds.observe(duration, method=request.method,
+                             route=getattr(route, "path", "unmatched"), status=status_code)
+
+
 class ErrorHandlingMiddleware(BaseHTTPMiddleware):
     """Comprehensive error handling middleware with structured logging"""
 
@@ -74,6 +110,8 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
         # Generate correlation ID for request tracking
         correlation_id = str(uuid.uuid4())
         request.state.correlation_id = correlation_id
+        db_stats = RequestDbStats(correlation_id)
+        request_db_stats.set(db_stats)
 
         # Log request start
         start_time = time.time()
@@ -89,9 +127,11 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
 
             # Log successful request
             duration = time.time() - start_time
+            _observe_request(request, response.status_code, duration)
             self.logger.log_event("request_completed", {
                 "status_code": response.status_code,
                 "duration_ms": round(duration * 1000, 2),
+                **db_stats.as_log_fields(),
                 "method": request.method,
                 "url": str(request.url)
             }, correlation_id=correlation_id)
@@ -103,10 +143,12 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
         except HTTPException as e:
             # Log HTTP exceptions
             duration = time.time() - start_time
+            _observe_request(request, e.status_code, duration)
             self.logger.log_event("request_http_error", {
                 "status_code": e.status_code,
                 "detail": e.detail,
                 "duration_ms": round(duration * 1000, 2),
+                **db_stats.as_log_fields(),
                 "method": request.method,
                 "url": str(request.url)
             }, level="WARNING", correlation_id=correlation_id)
@@ -121,10 +163,12 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
         except Exception as e:
             # Log unexpected errors
             duration = time.time() - start_time
+            _observe_request(request, 500, duration)
             self.logger.log_event("request_internal_error", {
                 "error_type": type(e).__name__,
                 "error_message": str(e),
                 "duration_ms": round(duration * 1000, 2),
+                **db_stats.as_log_fields(),
                 "method": request.method,
                 "url": str(request.url)
             }, level="ERROR", correlation_id=correlation_id)
@@ -138,6 +182,19 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
             )
 
 
+class ServiceOverloadedError(Exception):
+    """Raised when a request is shed to protect the service (maps to 429/503 + Retry-After)"""
+
+    error_code = "SERVICE_OVERLOADED"
+    message = "Service is temporarily overloaded, please retry shortly"
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
 def create_error_response(status_code: int, error_code: str, message: str,
                          correlation_id: str, details: Dict[str, Any] = None) -> JSONResponse:
     """Create standardized error response with proper structure"""
@@ -564,6 +621,29 @@ async def validation_exception_handler(request: Request, exc: ValueError):
     )
 
 
+async def overload_exception_handler(request: Request, exc: ServiceOverloadedError):
+    """Shed load with a Retry-After hint instead of queueing without bound"""
+    correlation_id = get_correlation_id(request)
+
+    structured_logger.log_event("request_shed", {
+        "reason": exc.reason,
+        "status_code": exc.status_code,
+        "retry_after": exc.retry_after,
+        "url": str(request.url),
+        "method": request.method
+    }, level="WARNING", correlation_id=correlation_id)
+
+    response = create_error_response(
+        status_code=exc.status_code,
+        error_code=exc.error_code,
+        message=exc.message,
+        correlation_id=correlation_id,
+        details={"reason": exc.reason}
+    )
+    response.headers["Retry-After"] = str(exc.retry_after)
+    return response
+
+
 async def database_exception_handler(request: Request, exc: asyncpg.PostgresError):
     """Handle database errors with proper categorization"""
     correlation_id = get_correlation_id(request)
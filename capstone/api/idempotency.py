@@ -0,0 +1,50 @@
+"""
+Per-process idempotency cache for Dizzy's Disease API
+Recent /market/buy responses keyed by X-Request-Id, in front of orders.response_json,
+so client retries (e.g. the Godot offline queue) are answered without a query
+"""
+
+import os
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .metrics import registry
+
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+
+class IdempotencyCache:
+    """LRU of completed purchase responses keyed by request id.
+
+    A completed order's response never changes, so entries need no invalidation;
+    a worker that has not seen the request falls through to the orders table.
+    Entries remember the owning user and are only replayed to them.
+    """
+
+    def __init__(self, max_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[uuid.UUID, Tuple[int, dict]]" = OrderedDict()
+
+        self._lookups = registry.counter(
+            "idempotency_cache_lookups_total", "Purchase retries looked up by result", ["result"])
+        registry.gauge("idempotency_cache_entries", "Cached purchase responses",
+                       callback=lambda: len(self._entries))
+
+    def get(self, request_id: uuid.UUID, user_id: int) -> Optional[dict]:
+        entry = self._entries.get(request_id)
+        if entry is None or entry[0] != user_id:
+            self._lookups.inc(result="miss")
+            return None
+        self._entries.move_to_end(request_id)
+        self._lookups.inc(result="hit")
+        return entry[1]
+
+    def put(self, request_id: uuid.UUID, user_id: int, response: dict) -> None:
+        self._entries[request_id] = (user_id, response)
+        self._entries.move_to_end(request_id)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+idempotency_cache = IdempotencyCache()
@@ -0,0 +1,102 @@
+"""
+Postgres LISTEN/NOTIFY fan-out for Dizzy's Disease API
+Keeps per-process caches coherent across workers without polling
+"""
+
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+
+from .error_handling import structured_logger
+
+NotificationHandler = Callable[[str], None]
+ResetHandler = Callable[[], None]
+
+
+class NotificationListener:
+    """Dedicated LISTEN connection that dispatches notifications to subscribed callbacks.
+
+    Whenever the connection is (re)established or lost, every reset handler runs so
+    caches can drop state that may have missed notifications in the meantime.
+    """
+
+    def __init__(self, dsn: str, reconnect_delay: float = 2.0, keepalive_interval: float = 30.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self.keepalive_interval = keepalive_interval
+        self._handlers: Dict[str, List[NotificationHandler]] = {}
+        self._reset_handlers: List[ResetHandler] = []
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected = False
+
+    @property
+    def connected(self) -> bool:
+        """True while notifications are being received, i.e. caches may trust them"""
+        return self._connected
+
+    def subscribe(self, channel: str, handler: NotificationHandler,
+                  on_reset: Optional[ResetHandler] = None) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+        if on_reset is not None:
+            self._reset_handlers.append(on_reset)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _dispatch(self, connection, pid: int, channel: str, payload: str) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                structured_logger.log_event("notification_handler_error", {
+                    "channel": channel,
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }, level="ERROR")
+
+    def _reset(self) -> None:
+        for handler in self._reset_handlers:
+            handler()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self._conn = await asyncpg.connect(self.dsn)
+                for channel in self._handlers:
+                    await self._conn.add_listener(channel, self._dispatch)
+                self._connected = True
+                self._reset()
+                structured_logger.log_event("notification_listener_connected", {
+                    "channels": list(self._handlers)
+                })
+                while not self._conn.is_closed():
+                    await asyncio.sleep(self.keepalive_interval)
+                    await self._conn.fetchval("SELECT 1", timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                structured_logger.log_event("notification_listener_error", {
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }, level="WARNING")
+            finally:
+                was_connected = self._connected
+                self._connected = False
+                if was_connected:
+                    self._reset()
+                if self._conn is not None:
+                    self._conn.terminate()
+                    self._conn = None
+            await asyncio.sleep(self.reconnect_delay)
@@ -0,0 +1,163 @@
+"""
+Per-process market snapshot cache for Dizzy's Disease API
+Serves /market and /market/prices from pre-encoded bodies versioned by the market rows'
+version column, invalidated by the market_version_changed trigger
+"""
+
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, Dict
+
+import asyncpg
+
+from .db import orjson
+from .metrics import registry
+
+MARKET_CACHE_MAX_SETTLEMENTS = int(os.getenv("MARKET_CACHE_MAX_SETTLEMENTS", "1000"))
+
+MARKET_CHANGED_CHANNEL = "market_changed"
+
+PoolGetter = Callable[[], Awaitable[asyncpg.Pool]]
+
+
+def _encode(body: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(body)
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+class MarketSnapshot:
+    """One settlement's market at given row versions, encoded once for every poller.
+
+    Row versions only grow, so their sum changes whenever any row does and serves as
+    the snapshot's version in the ETag.
+    """
+
+    __slots__ = ("settlement_id", "versions", "version", "etag", "market_body", "prices_body")
+
+    def __init__(self, settlement_id: int, rows):
+        self.settlement_id = settlement_id
+        self.versions: Dict[int, int] = {r["item_id"]: r["version"] for r in rows}
+        self.version = sum(self.versions.values())
+        self.etag = f'"{settlement_id}-{self.version}"'
+        self.market_body = _encode({"items": [
+            {"item_id": r["item_id"], "current_price": r["current_price"],
+             "qty_available": r["qty_available"]}
+            for r in rows
+        ]})
+        self.prices_body = _encode({
+            "prices": {r["name"]: r["current_price"] for r in rows},
+            "items": [
+                {"name": r["name"], "price": r["current_price"], "quantity": r["qty_available"]}
+                for r in rows
+            ],
+            "settlement_id": settlement_id
+        })
+
+
+class MarketSnapshotCache:
+    """Snapshots keyed by settlement_id, loaded once per version no matter how many clients poll.
+
+    Reads go to the read pool (replica when healthy). A NOTIFY announces the version a
+    market row committed as; a snapshot holding an older version of that row is neither
+    served from the cache nor stored, and is reloaded from the primary if the replica
+    has not caught up yet.
+    """
+
+    def __init__(self, read_pool_getter: PoolGetter, primary_pool_getter: PoolGetter,
+                 max_settlements: int = MARKET_CACHE_MAX_SETTLEMENTS):
+        self._read_pool_getter = read_pool_getter
+        self._primary_pool_getter = primary_pool_getter
+        self.max_settlements = max_settlements
+        self._snapshots: Dict[int, MarketSnapshot] = {}
+        # Highest version announced per settlement and item
+        self._announced: Dict[int, Dict[int, int]] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        # Bumped on clear() so loads started before a reset are not stored
+        self._generation = 0
+
+        self._lookups = registry.counter(
+            "market_snapshot_lookups_total", "Market snapshot lookups by result", ["result"])
+        self._loads = registry.counter(
+            "market_snapshot_loads_total", "Market snapshots loaded from the database", ["source"])
+        self._invalidations = registry.counter(
+            "market_snapshot_invalidations_total", "Snapshots invalidated by market_version_changed")
+        registry.gauge("market_snapshot_entries", "Cached market snapshots",
+                       callback=lambda: len(self._snapshots))
+
+    async def get(self, settlement_id: int, use_cache: bool = True) -> MarketSnapshot:
+        """Current snapshot; with use_cache=False (no NOTIFY feed) it is loaded and not kept"""
+        if not use_cache:
+            self._lookups.inc(result="bypass")
+            return await self._load(settlement_id)
+
+        snapshot = self._snapshots.get(settlement_id)
+        if snapshot is not None:
+            self._lookups.inc(result="hit")
+            return snapshot
+
+        loading = self._loading.get(settlement_id)
+        if loading is not None:
+            self._lookups.inc(result="coalesced")
+            return await asyncio.shield(loading)
+
+        self._lookups.inc(result="miss")
+        loading = asyncio.ensure_future(self._fill(settlement_id))
+        self._loading[settlement_id] = loading
+        loading.add_done_callback(lambda _: self._loading.pop(settlement_id, None))
+        return await asyncio.shield(loading)
+
+    async def _fill(self, settlement_id: int) -> MarketSnapshot:
+        generation = self._generation
+        snapshot = await self._load(settlement_id)
+        if generation == self._generation and self._is_current(snapshot):
+            if len(self._snapshots) >= self.max_settlements:
+                self._snapshots.clear()
+            self._snapshots[settlement_id] = snapshot
+        return snapshot
+
+    async def _load(self, settlement_id: int) -> MarketSnapshot:
+        read_pool = await self._read_pool_getter()
+        snapshot = await self._query(settlement_id, read_pool)
+        if not self._is_current(snapshot):
+            # The replica has not replayed the announced change yet
+            primary_pool = await self._primary_pool_getter()
+            if primary_pool is not read_pool:
+                snapshot = await self._query(settlement_id, primary_pool)
+                self._loads.inc(source="primary_fallback")
+                return snapshot
+        self._loads.inc(source="read_pool")
+        return snapshot
+
+    def _is_current(self, snapshot: MarketSnapshot) -> bool:
+        announced = self._announced.get(snapshot.settlement_id, {})
+        return all(snapshot.versions.get(item_id, 0) >= version
+                   for item_id, version in announced.items())
+
+    @staticmethod
+    async def _query(settlement_id: int, pool: asyncpg.Pool) -> MarketSnapshot:
+        async with pool.acquire() as conn:
+            # Rows and their versions come from one statement, so they are consistent
+            rows = await conn.fetch_named("market_snapshot", settlement_id)
+        return MarketSnapshot(settlement_id, rows)
+
+    def invalidate(self, payload: str) -> None:
+        """NOTIFY handler; payload is '<settlement_id>:<item_id>:<version>', or '*' for every settlement"""
+        self._invalidations.inc()
+        try:
+            settlement, item_id, version = (int(part) for part in payload.split(":", 2))
+        except ValueError:
+            self.clear()
+            return
+        announced = self._announced.setdefault(settlement, {})
+        if version > announced.get(item_id, 0):
+            announced[item_id] = version
+        snapshot = self._snapshots.get(settlement)
+        if snapshot is not None and snapshot.versions.get(item_id, 0) < version:
+            del self._snapshots[settlement]
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._snapshots.clear()
+        self._announced.clear()
@@ -0,0 +1,108 @@
+"""
+Partition maintenance for Dizzy's Disease API
+Keeps monthly events and market_events partitions created ahead of time and drops expired ones
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+import asyncpg
+
+from .error_handling import structured_logger
+from .metrics import registry
+
+EVENTS_PARTITIONS_AHEAD = int(os.getenv("EVENTS_PARTITIONS_AHEAD", "3"))
+EVENTS_RETENTION_MONTHS = int(os.getenv("EVENTS_RETENTION_MONTHS", "12"))  # 0 keeps everything
+MARKET_EVENTS_RETENTION_MONTHS = int(os.getenv("MARKET_EVENTS_RETENTION_MONTHS", "12"))  # 0 keeps everything
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))
+
+# Shared by every API worker; only the holder runs DDL in a given round
+PARTITION_MAINTENANCE_LOCK_KEY = 0x64697A7A01
+
+
+class EventPartitionMaintainer:
+    """Runs partitions_ensure_monthly / partitions_drop_monthly for each monthly-partitioned
+    table (events, market_events) at startup and then periodically.
+
+    A transaction-scoped advisory lock makes concurrent workers skip the round instead
+    of queueing behind each other's ATTACH/DETACH locks.
+    """
+
+    def __init__(self, pool_getter: Callable[[], Awaitable[asyncpg.Pool]],
+                 months_ahead: int = EVENTS_PARTITIONS_AHEAD,
+                 retention_months: int = EVENTS_RETENTION_MONTHS,
+                 market_events_retention_months: int = MARKET_EVENTS_RETENTION_MONTHS,
+                 interval: float = PARTITION_MAINTENANCE_INTERVAL):
+        self._pool_getter = pool_getter
+        self.months_ahead = months_ahead
+        # Table -> months of partitions to keep (0 keeps everything)
+        self.retention_months: Dict[str, int] = {
+            "events": retention_months,
+            "market_events": market_events_retention_months,
+        }
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+        self._created = registry.counter(
+            "events_partitions_created_total", "Monthly partitions created ahead of time", ["table"])
+        self._dropped = registry.counter(
+            "events_partitions_dropped_total", "Monthly partitions dropped by retention", ["table"])
+        self._failures = registry.counter(
+            "events_partition_maintenance_failures_total", "Partition maintenance rounds that raised")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failures.inc()
+                structured_logger.log_event("partition_maintenance_failed", {
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }, level="ERROR")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Optional[dict]:
+        """One maintenance round; returns what changed, or None if another worker holds the lock"""
+        pool = await self._pool_getter()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)",
+                                           PARTITION_MAINTENANCE_LOCK_KEY):
+                    return None
+                created, dropped = [], []
+                for table, retention_months in self.retention_months.items():
+                    table_created = [row[0] for row in await conn.fetch(
+                        "SELECT partitions_ensure_monthly($1, $2)", table, self.months_ahead)]
+                    table_dropped = []
+                    if retention_months > 0:
+                        table_dropped = [row[0] for row in await conn.fetch(
+                            "SELECT partitions_drop_monthly($1, $2)", table, retention_months)]
+                    self._created.inc(len(table_created), table=table)
+                    self._dropped.inc(len(table_dropped), table=table)
+                    created += table_created
+                    dropped += table_dropped
+
+        if created or dropped:
+            structured_logger.log_event("events_partitions_maintained", {
+                "created": created,
+                "dropped": dropped,
+                "retention_months": self.retention_months
+            })
+        return {"created": created, "dropped": dropped}
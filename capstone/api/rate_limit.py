@@ -0,0 +1,149 @@
+"""
+In-memory throttling for credential endpoints in Dizzy's Disease API
+Sliding-window counters per client IP and per email, checked before any DB or bcrypt work
+"""
+
+import asyncio
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+from .error_handling import ServiceOverloadedError
+from .metrics import registry
+
+AUTH_RATE_WINDOW_SECONDS = float(os.getenv("AUTH_RATE_WINDOW_SECONDS", "60"))
+AUTH_RATE_LIMIT_PER_IP = int(os.getenv("AUTH_RATE_LIMIT_PER_IP", "60"))        # 0 disables
+AUTH_RATE_LIMIT_PER_EMAIL = int(os.getenv("AUTH_RATE_LIMIT_PER_EMAIL", "10"))  # 0 disables
+AUTH_RATE_CLEANUP_INTERVAL = float(os.getenv("AUTH_RATE_CLEANUP_INTERVAL", "60"))
+# Reverse proxies in front of the API that append to X-Forwarded-For. With 0 the header is
+# ignored and the per-IP limit keys on the TCP peer, which behind a proxy is the proxy itself.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+
+def request_client_ip(request: Request, trusted_hops: int = TRUSTED_PROXY_HOPS) -> str:
+    """Client address as seen by the outermost trusted proxy.
+
+    Each proxy appends the address it received the request from, so only the last
+    trusted_hops entries of X-Forwarded-For are trustworthy; anything further left
+    was supplied by the client and is ignored.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if trusted_hops <= 0:
+        return peer
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    chain = forwarded + [peer]
+    return chain[max(0, len(chain) - 1 - trusted_hops)]
+
+
+class RateLimited(ServiceOverloadedError):
+    """Raised when a client exceeds the credential endpoint limits"""
+
+    error_code = "RATE_LIMITED"
+    message = "Too many attempts, please retry later"
+
+
+class SlidingWindowCounter:
+    """Approximate sliding window: the previous fixed window is weighted by its remaining overlap.
+
+    Each key costs one tuple (window index, previous count, current count), so memory stays
+    compact even during a credential-stuffing burst across many keys.
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._counts: Dict[str, Tuple[int, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def hit(self, key: str, now: float) -> Optional[int]:
+        """Count one attempt; returns seconds to wait if the limit is exceeded, else None"""
+        index = int(now // self.window)
+        window_index, previous, current = self._counts.get(key, (index, 0, 0))
+        if window_index != index:
+            previous = current if window_index == index - 1 else 0
+            current = 0
+
+        elapsed_fraction = (now % self.window) / self.window
+        estimated = previous * (1.0 - elapsed_fraction) + current
+        if estimated >= self.limit:
+            self._counts[key] = (index, previous, current)
+            return max(1, math.ceil(self.window * (1.0 - elapsed_fraction)))
+
+        self._counts[key] = (index, previous, current + 1)
+        return None
+
+    def cleanup(self, now: float) -> int:
+        """Drop keys whose counts can no longer affect a decision"""
+        index = int(now // self.window)
+        stale = [key for key, (window_index, _, _) in self._counts.items() if window_index < index - 1]
+        for key in stale:
+            del self._counts[key]
+        return len(stale)
+
+
+class AuthRateLimiter:
+    """Per-endpoint IP and email limiters for the credential endpoints"""
+
+    def __init__(self, per_ip: int = AUTH_RATE_LIMIT_PER_IP, per_email: int = AUTH_RATE_LIMIT_PER_EMAIL,
+                 window: float = AUTH_RATE_WINDOW_SECONDS,
+                 cleanup_interval: float = AUTH_RATE_CLEANUP_INTERVAL):
+        self.per_ip = per_ip
+        self.per_email = per_email
+        self.window = window
+        self.cleanup_interval = cleanup_interval
+        self._limiters: Dict[Tuple[str, str], SlidingWindowCounter] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self._rejected = registry.counter(
+            "auth_rate_limited_total", "Credential requests rejected by the rate limiter", ["endpoint", "scope"])
+        registry.gauge("auth_rate_limiter_keys", "Client keys tracked by the credential rate limiter",
+                       callback=lambda: sum(len(limiter) for limiter in self._limiters.values()))
+
+    def _limiter(self, endpoint: str, scope: str, limit: int) -> SlidingWindowCounter:
+        limiter = self._limiters.get((endpoint, scope))
+        if limiter is None:
+            limiter = self._limiters[(endpoint, scope)] = SlidingWindowCounter(limit, self.window)
+        return limiter
+
+    def check(self, endpoint: str, client_ip: str, email: Optional[str] = None) -> None:
+        """Raise RateLimited if this attempt exceeds the IP or email budget for endpoint"""
+        now = time.time()
+        checks: List[Tuple[str, str, int]] = [("ip", client_ip, self.per_ip)]
+        if email:
+            checks.append(("email", email.strip().lower(), self.per_email))
+
+        for scope, key, limit in checks:
+            if limit <= 0:
+                continue
+            retry_after = self._limiter(endpoint, scope, limit).hit(key, now)
+            if retry_after is not None:
+                self._rejected.inc(endpoint=endpoint, scope=scope)
+                raise RateLimited(429, retry_after, f"{scope}_limit")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_cleanup())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_cleanup(self) -> None:
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            now = time.time()
+            for limiter in list(self._limiters.values()):
+                limiter.cleanup(now)
+
+
+auth_rate_limiter = AuthRateLimiter()
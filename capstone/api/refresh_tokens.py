@@ -0,0 +1,85 @@
+"""
+Refresh token housekeeping for Dizzy's Disease API
+Deletes expired refresh_tokens rows so rotation does not grow the table forever
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+
+import asyncpg
+
+from .error_handling import structured_logger
+from .metrics import registry
+
+REFRESH_TOKEN_PURGE_INTERVAL = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL", "3600"))
+REFRESH_TOKEN_PURGE_BATCH = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH", "5000"))
+
+
+class RefreshTokenPurger:
+    """Deletes expired refresh tokens at startup and then periodically.
+
+    Every refresh revokes one row and inserts another, so without this the table grows
+    with every session renewal. Revoked rows stay until their own expiry: replaying a
+    revoked token is how a leaked token is detected (refresh_token_family_revoke), and
+    after expiry it would be rejected anyway. Rows go in batches of
+    REFRESH_TOKEN_PURGE_BATCH with SKIP LOCKED, so a purge never holds long locks and
+    concurrent workers do not wait on each other.
+    """
+
+    def __init__(self, pool_getter: Callable[[], Awaitable[asyncpg.Pool]],
+                 interval: float = REFRESH_TOKEN_PURGE_INTERVAL,
+                 batch_size: int = REFRESH_TOKEN_PURGE_BATCH):
+        self._pool_getter = pool_getter
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        self._purged = registry.counter(
+            "refresh_tokens_purged_total", "Expired refresh tokens deleted")
+        self._failures = registry.counter(
+            "refresh_token_purge_failures_total", "Refresh token purge rounds that raised")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failures.inc()
+                structured_logger.log_event("refresh_token_purge_failed", {
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }, level="ERROR")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Delete every currently expired token, one batch per statement; returns rows deleted"""
+        pool = await self._pool_getter()
+        purged = 0
+        async with pool.acquire() as conn:
+            while True:
+                status = await conn.execute_named("refresh_tokens_purge_expired", self.batch_size)
+                deleted = int(status.split()[-1])
+                purged += deleted
+                if deleted < self.batch_size:
+                    break
+
+        self._purged.inc(purged)
+        if purged:
+            structured_logger.log_event("refresh_tokens_purged", {"purged": purged})
+        return purged
@@ -0,0 +1,162 @@
+"""
+Read-replica routing for Dizzy's Disease API
+Read-only endpoints use a streaming replica when one is configured and caught up,
+and fall back to the primary pool when it is lagging or unreachable.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+
+import asyncpg
+
+from .db import get_pool, warm_pool, close_pool
+from .error_handling import structured_logger
+from .metrics import registry
+
+DB_REPLICA_DSN = os.getenv("DATABASE_REPLICA_URL")  # unset disables replica routing
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "2"))
+
+# Age of the last replayed commit. The router commits a heartbeat on the primary every
+# check interval, so a caught-up replica stays within one interval even when the game
+# is idle. NULL (lag unknown) when the WAL receiver is not streaming: received and
+# replayed LSNs also match once the replica has lost its primary.
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END::float8
+"""
+
+
+class ReplicaRouter:
+    """Owns the replica pool and decides, per request, which pool serves reads.
+
+    The lag probe runs in the background so routing never adds a round trip; a failed
+    probe, a replica that is not streaming, or lag above max_lag sends reads to the
+    primary until the next good probe. Each round also commits a heartbeat on the
+    primary so the replica's replay timestamp keeps moving while nothing else is written.
+    """
+
+    def __init__(self, primary_pool_getter: Callable[[], Awaitable[asyncpg.Pool]],
+                 dsn: Optional[str] = DB_REPLICA_DSN,
+                 max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_LAG_CHECK_INTERVAL):
+        self._primary_pool_getter = primary_pool_getter
+        self.dsn = dsn
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.pool: Optional[asyncpg.Pool] = None
+        self.lag_seconds: Optional[float] = None
+        self._healthy = False
+        self._probe_failed = False
+        self._heartbeat_failed = False
+        self._task: Optional[asyncio.Task] = None
+
+        self._routed = registry.counter(
+            "db_read_routed_total", "Read-only requests by the pool that served them", ["target"])
+        registry.gauge("db_replica_lag_seconds",
+                       "Last measured replica replay lag (-1 if unknown or not streaming)",
+                       callback=lambda: -1 if self.lag_seconds is None else self.lag_seconds)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.dsn)
+
+    @property
+    def healthy(self) -> bool:
+        """True while the last probe succeeded and lag was within max_lag"""
+        return self._healthy
+
+    def read_pool(self, primary: asyncpg.Pool) -> asyncpg.Pool:
+        if self._healthy and self.pool is not None:
+            self._routed.inc(target="replica")
+            return self.pool
+        self._routed.inc(target="primary")
+        return primary
+
+    def status(self) -> dict:
+        if not self.enabled:
+            return {"configured": False}
+        return {
+            "configured": True,
+            "routing": "replica" if self._healthy else "primary",
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag
+        }
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._healthy = False
+        if self.pool is not None:
+            await close_pool(self.pool)
+            self.pool = None
+
+    async def heartbeat(self) -> None:
+        """Commit on the primary so the replica has something recent to replay"""
+        pool = await self._primary_pool_getter()
+        async with pool.acquire() as conn:
+            await conn.execute_named("replica_heartbeat")
+
+    async def check_lag(self) -> Optional[float]:
+        """Probe the replica once and update the routing decision; None means not streaming"""
+        if self.pool is None:
+            # Created lazily so an unreachable replica never blocks startup
+            self.pool = await get_pool(self.dsn, name="replica")
+            await warm_pool(self.pool)
+        async with self.pool.acquire() as conn:
+            lag = await conn.fetchval(REPLICA_LAG_SQL)
+
+        self.lag_seconds = lag
+        self._probe_failed = False
+        healthy = lag is not None and lag <= self.max_lag
+        if healthy != self._healthy:
+            structured_logger.log_event("replica_routing_changed", {
+                "routing": "replica" if healthy else "primary",
+                "lag_seconds": lag,
+                "max_lag_seconds": self.max_lag
+            }, level="INFO" if healthy else "WARNING")
+        self._healthy = healthy
+        return lag
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.heartbeat()
+                self._heartbeat_failed = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Without heartbeats an idle replica reads as lagging, so reads stay on the primary
+                if not self._heartbeat_failed:
+                    structured_logger.log_event("replica_heartbeat_failed", {
+                        "error_type": type(e).__name__,
+                        "error_message": str(e)
+                    }, level="WARNING")
+                self._heartbeat_failed = True
+            try:
+                await self.check_lag()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._probe_failed:
+                    structured_logger.log_event("replica_unavailable", {
+                        "error_type": type(e).__name__,
+                        "error_message": str(e)
+                    }, level="WARNING")
+                self._probe_failed = True
+                self._healthy = False
+                self.lag_seconds = None
+            await asyncio.sleep(self.check_interval)
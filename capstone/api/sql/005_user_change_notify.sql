@@ -0,0 +1,23 @@
+-- Push invalidation for per-process caches of users rows (email verification status)
+-- API workers LISTEN on 'user_changed'; the payload is the affected user_id.
+-- Only changes that caches depend on notify, so last_login writes stay silent.
+
+CREATE OR REPLACE FUNCTION notify_user_changed() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('user_changed', OLD.user_id::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_notify_changed ON users;
+CREATE TRIGGER users_notify_changed
+  AFTER UPDATE OF email_verified ON users
+  FOR EACH ROW
+  WHEN (OLD.email_verified IS DISTINCT FROM NEW.email_verified)
+  EXECUTE FUNCTION notify_user_changed();
+
+DROP TRIGGER IF EXISTS users_notify_deleted ON users;
+CREATE TRIGGER users_notify_deleted
+  AFTER DELETE ON users
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_user_changed();
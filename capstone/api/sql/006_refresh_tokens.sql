@@ -0,0 +1,17 @@
+-- Rotating refresh tokens: renewing a session is one indexed lookup instead of a bcrypt login.
+-- Only a SHA-256 digest of each token is stored; every refresh revokes the presented token
+-- and issues a new one in the same family, and replaying a revoked token revokes the family.
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+  token_id BIGSERIAL PRIMARY KEY,
+  user_id INT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+  token_hash TEXT NOT NULL,
+  family_id UUID NOT NULL,
+  expires_at TIMESTAMPTZ NOT NULL,
+  revoked_at TIMESTAMPTZ,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_refresh_tokens_hash ON refresh_tokens(token_hash);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens(family_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens(user_id) WHERE revoked_at IS NULL;
@@ -0,0 +1,20 @@
+-- migrate:no-transaction
+-- Secondary indexes for the hot market, events and character queries.
+-- Built CONCURRENTLY so writers are not blocked; the runner executes each
+-- statement on its own outside a transaction. If a build is interrupted,
+-- drop the INVALID index it leaves behind before re-running.
+
+-- market_buy locks (settlement_id, item_id) FOR UPDATE; /market filters on settlement_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_market_settlement_item
+  ON market(settlement_id, item_id);
+
+-- /market/events: type + settlement from the payload, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_type_settlement_created
+  ON events(type, (payload_json->>'settlement_id'), created_at);
+
+-- GET /characters and the purchase wallet lookup: user_id ORDER BY created_at
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_characters_user_created
+  ON characters(user_id, created_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_inventories_character
+  ON inventories(character_id);
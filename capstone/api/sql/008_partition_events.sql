@@ -0,0 +1,98 @@
+-- Range-partition events by month so reads touch only recent partitions and
+-- retention can drop whole months instead of DELETEing rows.
+-- events_ensure_partitions() creates months ahead of time; events_default only
+-- catches rows outside every monthly range. The API runs both maintenance
+-- functions periodically (see api/partitions.py). Safe to re-run: the conversion
+-- only happens while events is still a plain table.
+
+-- Create monthly partitions events_pYYYY_MM from p_from's month through p_months_ahead
+-- months past the current one. Rows already sitting in events_default for a new month
+-- are moved into it, since attaching would otherwise fail validation.
+CREATE OR REPLACE FUNCTION events_ensure_partitions(
+  p_months_ahead INT DEFAULT 3,
+  p_from TIMESTAMP DEFAULT LOCALTIMESTAMP
+) RETURNS SETOF TEXT AS $$
+DECLARE
+  month_start TIMESTAMP := date_trunc('month', LEAST(p_from, LOCALTIMESTAMP));
+  last_month TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) + make_interval(months => p_months_ahead);
+  month_end TIMESTAMP;
+  partition_name TEXT;
+BEGIN
+  WHILE month_start <= last_month LOOP
+    month_end := month_start + INTERVAL '1 month';
+    partition_name := 'events_p' || to_char(month_start, 'YYYY_MM');
+
+    IF to_regclass(partition_name) IS NULL THEN
+      EXECUTE format('CREATE TABLE %I (LIKE events INCLUDING DEFAULTS)', partition_name);
+      EXECUTE format(
+        'WITH moved AS (DELETE FROM events_default WHERE created_at >= $1 AND created_at < $2 RETURNING *)
+         INSERT INTO %I SELECT * FROM moved', partition_name)
+        USING month_start, month_end;
+      EXECUTE format('ALTER TABLE events ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                     partition_name, month_start, month_end);
+      RETURN NEXT partition_name;
+    END IF;
+
+    month_start := month_end;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach and drop monthly partitions whose whole range is older than p_retain_months
+-- full months before the current one. Returns the dropped partition names.
+CREATE OR REPLACE FUNCTION events_drop_partitions(p_retain_months INT)
+RETURNS SETOF TEXT AS $$
+DECLARE
+  cutoff TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) - make_interval(months => p_retain_months);
+  partition_name TEXT;
+BEGIN
+  FOR partition_name IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'events'::regclass
+      AND c.relname ~ '^events_p[0-9]{4}_[0-9]{2}$'
+      AND to_timestamp(substr(c.relname, 9), 'YYYY_MM')::timestamp + INTERVAL '1 month' <= cutoff
+    ORDER BY c.relname
+  LOOP
+    EXECUTE format('ALTER TABLE events DETACH PARTITION %I', partition_name);
+    EXECUTE format('DROP TABLE %I', partition_name);
+    RETURN NEXT partition_name;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('events')) <> 'p' THEN
+    ALTER TABLE events RENAME TO events_unpartitioned;
+    ALTER TABLE events_unpartitioned RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey;
+    ALTER INDEX IF EXISTS idx_events_type_settlement_created RENAME TO idx_events_unpartitioned_type_settlement;
+    ALTER SEQUENCE events_event_id_seq OWNED BY NONE;
+
+    -- The partition key must be part of the primary key
+    CREATE TABLE events (
+      event_id INT NOT NULL DEFAULT nextval('events_event_id_seq'),
+      type TEXT NOT NULL,
+      payload_json JSONB NOT NULL DEFAULT '{}'::jsonb,
+      created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+      PRIMARY KEY (event_id, created_at)
+    ) PARTITION BY RANGE (created_at);
+
+    ALTER SEQUENCE events_event_id_seq OWNED BY events.event_id;
+
+    CREATE TABLE events_default PARTITION OF events DEFAULT;
+
+    PERFORM events_ensure_partitions(3, COALESCE((SELECT MIN(created_at) FROM events_unpartitioned), LOCALTIMESTAMP));
+
+    INSERT INTO events (event_id, type, payload_json, created_at)
+    SELECT event_id, type, payload_json, created_at FROM events_unpartitioned;
+
+    DROP TABLE events_unpartitioned;
+  END IF;
+END;
+$$;
+
+-- Cascades to every partition, including ones created later
+CREATE INDEX IF NOT EXISTS idx_events_type_settlement_created
+  ON events(type, (payload_json->>'settlement_id'), created_at);
@@ -0,0 +1,32 @@
+-- Typed home for market events: settlement_id is a real column, so GET /market/events
+-- is an index range scan instead of a JSON extraction on every events row.
+
+CREATE TABLE IF NOT EXISTS market_events (
+  market_event_id BIGSERIAL PRIMARY KEY,
+  settlement_id INT NOT NULL,
+  event_type TEXT NOT NULL,
+  price_changes JSONB NOT NULL DEFAULT '{}'::jsonb,
+  client_timestamp DOUBLE PRECISION,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_market_events_settlement_created
+  ON market_events(settlement_id, created_at DESC);
+
+-- Backfill: move market_event rows out of the generic events table. Rows whose
+-- payload has no integer settlement_id are left where they are.
+WITH moved AS (
+  DELETE FROM events
+  WHERE type = 'market_event'
+    AND payload_json->>'settlement_id' ~ '^[0-9]+$'
+  RETURNING payload_json, created_at
+)
+INSERT INTO market_events (settlement_id, event_type, price_changes, client_timestamp, created_at)
+SELECT
+  (payload_json->>'settlement_id')::int,
+  COALESCE(payload_json->>'event_type', 'unknown'),
+  COALESCE(payload_json->'price_changes', '{}'::jsonb),
+  CASE WHEN jsonb_typeof(payload_json->'timestamp') = 'number'
+       THEN (payload_json->>'timestamp')::double precision END,
+  created_at
+FROM moved;
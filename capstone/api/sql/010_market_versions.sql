@@ -0,0 +1,69 @@
+-- Per-settlement market version for the API's snapshot cache (see api/market_cache.py).
+-- Every committed change to a settlement's market rows moves its version to a new
+-- value of market_version_seq and NOTIFYs 'market_changed' with '<settlement_id>:<version>'.
+-- The triggers are deferred to commit time, so the market_versions row is only locked
+-- for the duration of the commit rather than the rest of a buy transaction.
+
+CREATE SEQUENCE IF NOT EXISTS market_version_seq;
+
+CREATE TABLE IF NOT EXISTS market_versions (
+  settlement_id INT PRIMARY KEY,
+  version BIGINT NOT NULL
+);
+
+INSERT INTO market_versions (settlement_id, version)
+SELECT settlement_id, nextval('market_version_seq')
+FROM (SELECT DISTINCT settlement_id FROM market) s
+ON CONFLICT (settlement_id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION market_bump_version() RETURNS trigger AS $$
+DECLARE
+  changed_settlement INT;
+  new_version BIGINT;
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    changed_settlement := OLD.settlement_id;
+  ELSE
+    changed_settlement := NEW.settlement_id;
+  END IF;
+
+  INSERT INTO market_versions (settlement_id, version)
+  VALUES (changed_settlement, nextval('market_version_seq'))
+  ON CONFLICT (settlement_id) DO UPDATE SET version = EXCLUDED.version
+  RETURNING version INTO new_version;
+
+  PERFORM pg_notify('market_changed', changed_settlement || ':' || new_version);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS market_version_changed ON market;
+CREATE CONSTRAINT TRIGGER market_version_changed
+  AFTER UPDATE ON market
+  DEFERRABLE INITIALLY DEFERRED
+  FOR EACH ROW
+  WHEN (OLD.current_price IS DISTINCT FROM NEW.current_price
+        OR OLD.qty_available IS DISTINCT FROM NEW.qty_available)
+  EXECUTE FUNCTION market_bump_version();
+
+DROP TRIGGER IF EXISTS market_version_inserted_deleted ON market;
+CREATE CONSTRAINT TRIGGER market_version_inserted_deleted
+  AFTER INSERT OR DELETE ON market
+  DEFERRABLE INITIALLY DEFERRED
+  FOR EACH ROW
+  EXECUTE FUNCTION market_bump_version();
+
+-- Snapshots include item names, so a rename invalidates every settlement
+CREATE OR REPLACE FUNCTION market_bump_all_versions() RETURNS trigger AS $$
+BEGIN
+  UPDATE market_versions SET version = nextval('market_version_seq');
+  PERFORM pg_notify('market_changed', '*');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS items_market_version_changed ON items;
+CREATE TRIGGER items_market_version_changed
+  AFTER UPDATE OF name ON items
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION market_bump_all_versions();
@@ -0,0 +1,64 @@
+-- Whole market purchase in one server-side call, so row locks are held for the
+-- duration of the function rather than across eight client round trips.
+-- Returns one of 'ok', 'duplicate', 'out_of_stock', 'insufficient_funds'; nothing
+-- is written unless the result is 'ok'.
+
+CREATE OR REPLACE FUNCTION market_buy(
+  p_request_id UUID,
+  p_user_id INT,
+  p_settlement_id INT,
+  p_item_id INT,
+  p_quantity INT
+) RETURNS TEXT AS $$
+DECLARE
+  v_character_id INT;
+  v_money INT;
+  v_price INT;
+  v_qty_available INT;
+  v_total INT;
+BEGIN
+  IF EXISTS (SELECT 1 FROM orders WHERE request_id = p_request_id) THEN
+    RETURN 'duplicate';
+  END IF;
+
+  -- The user's first character is the wallet; lock it before the contended market row
+  SELECT character_id, money INTO v_character_id, v_money
+  FROM characters
+  WHERE user_id = p_user_id
+  ORDER BY created_at
+  LIMIT 1
+  FOR UPDATE;
+
+  SELECT current_price, qty_available INTO v_price, v_qty_available
+  FROM market
+  WHERE settlement_id = p_settlement_id AND item_id = p_item_id
+  FOR UPDATE;
+
+  IF v_qty_available IS NULL OR v_qty_available < p_quantity THEN
+    RETURN 'out_of_stock';
+  END IF;
+
+  v_total := v_price * p_quantity;
+  IF v_character_id IS NULL OR v_money < v_total THEN
+    RETURN 'insufficient_funds';
+  END IF;
+
+  -- A concurrent call with the same request id waits here and then sees the conflict
+  INSERT INTO orders (request_id, user_id, item_id, quantity, price, order_type, completed)
+  VALUES (p_request_id, p_user_id, p_item_id, p_quantity, v_total, 'buy', TRUE)
+  ON CONFLICT (request_id) DO NOTHING;
+  IF NOT FOUND THEN
+    RETURN 'duplicate';
+  END IF;
+
+  UPDATE characters SET money = money - v_total WHERE character_id = v_character_id;
+
+  UPDATE market SET qty_available = qty_available - p_quantity
+  WHERE settlement_id = p_settlement_id AND item_id = p_item_id;
+
+  INSERT INTO inventories (character_id, item_id, quantity, durability_current)
+  VALUES (v_character_id, p_item_id, p_quantity, 100);
+
+  RETURN 'ok';
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,93 @@
+-- Group commit for purchases of one (settlement, item): the API collects concurrent
+-- buys for a few milliseconds (api/buy_batcher.py) and applies them with one call.
+-- Each request gets the same result market_buy() would have given it in arrival
+-- order; the market row is locked once and decremented once for the whole batch.
+
+CREATE OR REPLACE FUNCTION market_buy_batch(
+  p_settlement_id INT,
+  p_item_id INT,
+  p_request_ids UUID[],
+  p_user_ids INT[],
+  p_quantities INT[]
+) RETURNS TABLE (batch_position INT, status TEXT) AS $$
+DECLARE
+  v_price INT;
+  v_remaining INT;
+  v_sold INT := 0;
+  v_character_id INT;
+  v_money INT;
+  v_total INT;
+BEGIN
+  -- Wallets first and in character_id order, so batches for different items that
+  -- share buyers cannot deadlock; then the market row, as market_buy() does
+  PERFORM 1
+  FROM characters
+  WHERE character_id IN (
+    SELECT DISTINCT ON (user_id) character_id
+    FROM characters
+    WHERE user_id = ANY(p_user_ids)
+    ORDER BY user_id, created_at
+  )
+  ORDER BY character_id
+  FOR UPDATE;
+
+  SELECT current_price, qty_available INTO v_price, v_remaining
+  FROM market
+  WHERE settlement_id = p_settlement_id AND item_id = p_item_id
+  FOR UPDATE;
+
+  FOR i IN 1 .. coalesce(array_length(p_request_ids, 1), 0) LOOP
+    batch_position := i;
+
+    IF EXISTS (SELECT 1 FROM orders WHERE request_id = p_request_ids[i]) THEN
+      status := 'duplicate';
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    IF v_remaining IS NULL OR v_remaining < p_quantities[i] THEN
+      status := 'out_of_stock';
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    -- Already locked above; re-read so earlier buys in the batch are reflected
+    SELECT character_id, money INTO v_character_id, v_money
+    FROM characters
+    WHERE user_id = p_user_ids[i]
+    ORDER BY created_at
+    LIMIT 1;
+
+    v_total := v_price * p_quantities[i];
+    IF v_character_id IS NULL OR v_money < v_total THEN
+      status := 'insufficient_funds';
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    INSERT INTO orders (request_id, user_id, item_id, quantity, price, order_type, completed)
+    VALUES (p_request_ids[i], p_user_ids[i], p_item_id, p_quantities[i], v_total, 'buy', TRUE)
+    ON CONFLICT (request_id) DO NOTHING;
+    IF NOT FOUND THEN
+      status := 'duplicate';
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    UPDATE characters SET money = money - v_total WHERE character_id = v_character_id;
+
+    INSERT INTO inventories (character_id, item_id, quantity, durability_current)
+    VALUES (v_character_id, p_item_id, p_quantities[i], 100);
+
+    v_remaining := v_remaining - p_quantities[i];
+    v_sold := v_sold + p_quantities[i];
+    status := 'ok';
+    RETURN NEXT;
+  END LOOP;
+
+  IF v_sold > 0 THEN
+    UPDATE market SET qty_available = qty_available - v_sold
+    WHERE settlement_id = p_settlement_id AND item_id = p_item_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,194 @@
+-- Store each purchase's response body on its order so a retried X-Request-Id gets the
+-- original outcome back instead of a bare {"duplicate": true}. market_buy() and
+-- market_buy_batch() now return the body alongside the status; a duplicate returns
+-- the stored body only to the user who placed the order.
+
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS response_json JSONB;
+
+UPDATE orders
+SET response_json = jsonb_build_object(
+  'ok', TRUE, 'order_id', request_id, 'duplicate', FALSE,
+  'item_id', item_id, 'quantity', quantity, 'price', price
+)
+WHERE response_json IS NULL AND completed;
+
+-- Changing the result type needs a drop
+DROP FUNCTION IF EXISTS market_buy(UUID, INT, INT, INT, INT);
+DROP FUNCTION IF EXISTS market_buy_batch(INT, INT, UUID[], INT[], INT[]);
+
+-- The stored body of an existing order: NULL when it belongs to another user
+CREATE OR REPLACE FUNCTION market_buy_replay(p_request_id UUID, p_user_id INT)
+RETURNS JSONB AS $$
+  SELECT CASE WHEN user_id = p_user_id THEN response_json END
+  FROM orders
+  WHERE request_id = p_request_id
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION market_buy(
+  p_request_id UUID,
+  p_user_id INT,
+  p_settlement_id INT,
+  p_item_id INT,
+  p_quantity INT
+) RETURNS TABLE (status TEXT, response JSONB) AS $$
+DECLARE
+  v_character_id INT;
+  v_money INT;
+  v_price INT;
+  v_qty_available INT;
+  v_total INT;
+BEGIN
+  IF EXISTS (SELECT 1 FROM orders WHERE request_id = p_request_id) THEN
+    RETURN QUERY SELECT 'duplicate'::TEXT, market_buy_replay(p_request_id, p_user_id);
+    RETURN;
+  END IF;
+
+  -- The user's first character is the wallet; lock it before the contended market row
+  SELECT character_id, money INTO v_character_id, v_money
+  FROM characters
+  WHERE user_id = p_user_id
+  ORDER BY created_at
+  LIMIT 1
+  FOR UPDATE;
+
+  SELECT current_price, qty_available INTO v_price, v_qty_available
+  FROM market
+  WHERE settlement_id = p_settlement_id AND item_id = p_item_id
+  FOR UPDATE;
+
+  IF v_qty_available IS NULL OR v_qty_available < p_quantity THEN
+    RETURN QUERY SELECT 'out_of_stock'::TEXT, NULL::JSONB;
+    RETURN;
+  END IF;
+
+  v_total := v_price * p_quantity;
+  IF v_character_id IS NULL OR v_money < v_total THEN
+    RETURN QUERY SELECT 'insufficient_funds'::TEXT, NULL::JSONB;
+    RETURN;
+  END IF;
+
+  response := jsonb_build_object(
+    'ok', TRUE, 'order_id', p_request_id, 'duplicate', FALSE,
+    'settlement_id', p_settlement_id, 'item_id', p_item_id,
+    'quantity', p_quantity, 'price', v_total, 'money', v_money - v_total
+  );
+
+  -- A concurrent call with the same request id waits here and then sees the conflict
+  INSERT INTO orders (request_id, user_id, item_id, quantity, price, order_type, completed, response_json)
+  VALUES (p_request_id, p_user_id, p_item_id, p_quantity, v_total, 'buy', TRUE, response)
+  ON CONFLICT (request_id) DO NOTHING;
+  IF NOT FOUND THEN
+    RETURN QUERY SELECT 'duplicate'::TEXT, market_buy_replay(p_request_id, p_user_id);
+    RETURN;
+  END IF;
+
+  UPDATE characters SET money = money - v_total WHERE character_id = v_character_id;
+
+  UPDATE market SET qty_available = qty_available - p_quantity
+  WHERE settlement_id = p_settlement_id AND item_id = p_item_id;
+
+  INSERT INTO inventories (character_id, item_id, quantity, durability_current)
+  VALUES (v_character_id, p_item_id, p_quantity, 100);
+
+  status := 'ok';
+  RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION market_buy_batch(
+  p_settlement_id INT,
+  p_item_id INT,
+  p_request_ids UUID[],
+  p_user_ids INT[],
+  p_quantities INT[]
+) RETURNS TABLE (batch_position INT, status TEXT, response JSONB) AS $$
+DECLARE
+  v_price INT;
+  v_remaining INT;
+  v_sold INT := 0;
+  v_character_id INT;
+  v_money INT;
+  v_total INT;
+BEGIN
+  -- Wallets first and in character_id order, so batches for different items that
+  -- share buyers cannot deadlock; then the market row, as market_buy() does
+  PERFORM 1
+  FROM characters
+  WHERE character_id IN (
+    SELECT DISTINCT ON (user_id) character_id
+    FROM characters
+    WHERE user_id = ANY(p_user_ids)
+    ORDER BY user_id, created_at
+  )
+  ORDER BY character_id
+  FOR UPDATE;
+
+  SELECT current_price, qty_available INTO v_price, v_remaining
+  FROM market
+  WHERE settlement_id = p_settlement_id AND item_id = p_item_id
+  FOR UPDATE;
+
+  FOR i IN 1 .. coalesce(array_length(p_request_ids, 1), 0) LOOP
+    batch_position := i;
+    response := NULL;
+
+    IF EXISTS (SELECT 1 FROM orders WHERE request_id = p_request_ids[i]) THEN
+      status := 'duplicate';
+      response := market_buy_replay(p_request_ids[i], p_user_ids[i]);
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    IF v_remaining IS NULL OR v_remaining < p_quantities[i] THEN
+      status := 'out_of_stock';
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    -- Already locked above; re-read so earlier buys in the batch are reflected
+    SELECT character_id, money INTO v_character_id, v_money
+    FROM characters
+    WHERE user_id = p_user_ids[i]
+    ORDER BY created_at
+    LIMIT 1;
+
+    v_total := v_price * p_quantities[i];
+    IF v_character_id IS NULL OR v_money < v_total THEN
+      status := 'insufficient_funds';
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    response := jsonb_build_object(
+      'ok', TRUE, 'order_id', p_request_ids[i], 'duplicate', FALSE,
+      'settlement_id', p_settlement_id, 'item_id', p_item_id,
+      'quantity', p_quantities[i], 'price', v_total, 'money', v_money - v_total
+    );
+
+    INSERT INTO orders (request_id, user_id, item_id, quantity, price, order_type, completed, response_json)
+    VALUES (p_request_ids[i], p_user_ids[i], p_item_id, p_quantities[i], v_total, 'buy', TRUE, response)
+    ON CONFLICT (request_id) DO NOTHING;
+    IF NOT FOUND THEN
+      status := 'duplicate';
+      response := market_buy_replay(p_request_ids[i], p_user_ids[i]);
+      RETURN NEXT;
+      CONTINUE;
+    END IF;
+
+    UPDATE characters SET money = money - v_total WHERE character_id = v_character_id;
+
+    INSERT INTO inventories (character_id, item_id, quantity, durability_current)
+    VALUES (v_character_id, p_item_id, p_quantities[i], 100);
+
+    v_remaining := v_remaining - p_quantities[i];
+    v_sold := v_sold + p_quantities[i];
+    status := 'ok';
+    RETURN NEXT;
+  END LOOP;
+
+  IF v_sold > 0 THEN
+    UPDATE market SET qty_available = qty_available - v_sold
+    WHERE settlement_id = p_settlement_id AND item_id = p_item_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,15 @@
+-- Reload signal for the API's in-memory item catalog (see api/catalog.py).
+-- Statement-level, so a bulk import sends one notification rather than one per row.
+
+CREATE OR REPLACE FUNCTION notify_items_changed() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('items_changed', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS items_notify_changed ON items;
+CREATE TRIGGER items_notify_changed
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON items
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION notify_items_changed();
@@ -0,0 +1,72 @@
+-- Append-only price history for market rows, plus OHLC rollups per minute, hour and
+-- day maintained incrementally by the same trigger, so /market/history reads a
+-- handful of rollup rows instead of scanning ticks. Buys only change qty_available,
+-- so ticks come from market events and new listings.
+
+CREATE TABLE IF NOT EXISTS market_price_ticks (
+  tick_id BIGSERIAL PRIMARY KEY,
+  settlement_id INT NOT NULL,
+  item_id INT NOT NULL,
+  price INT NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_market_price_ticks_settlement_item_created
+  ON market_price_ticks(settlement_id, item_id, created_at);
+
+CREATE TABLE IF NOT EXISTS market_price_rollups (
+  settlement_id INT NOT NULL,
+  item_id INT NOT NULL,
+  resolution TEXT NOT NULL CHECK (resolution IN ('minute', 'hour', 'day')),
+  bucket TIMESTAMP NOT NULL,
+  open INT NOT NULL,
+  high INT NOT NULL,
+  low INT NOT NULL,
+  close INT NOT NULL,
+  ticks INT NOT NULL DEFAULT 1,
+  PRIMARY KEY (settlement_id, item_id, resolution, bucket)
+);
+
+-- Fold one tick into its minute, hour and day buckets
+CREATE OR REPLACE FUNCTION market_price_record(
+  p_settlement_id INT, p_item_id INT, p_price INT, p_at TIMESTAMP
+) RETURNS VOID AS $$
+BEGIN
+  INSERT INTO market_price_ticks (settlement_id, item_id, price, created_at)
+  VALUES (p_settlement_id, p_item_id, p_price, p_at);
+
+  INSERT INTO market_price_rollups AS r (settlement_id, item_id, resolution, bucket, open, high, low, close)
+  SELECT p_settlement_id, p_item_id, resolution, date_trunc(resolution, p_at),
+         p_price, p_price, p_price, p_price
+  FROM unnest(ARRAY['minute', 'hour', 'day']) AS resolution
+  ON CONFLICT (settlement_id, item_id, resolution, bucket) DO UPDATE
+  SET high = GREATEST(r.high, EXCLUDED.high),
+      low = LEAST(r.low, EXCLUDED.low),
+      close = EXCLUDED.close,
+      ticks = r.ticks + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION market_price_tick() RETURNS trigger AS $$
+BEGIN
+  PERFORM market_price_record(NEW.settlement_id, NEW.item_id, NEW.current_price, LOCALTIMESTAMP);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS market_price_history ON market;
+CREATE TRIGGER market_price_history
+  AFTER UPDATE OF current_price ON market
+  FOR EACH ROW
+  WHEN (OLD.current_price IS DISTINCT FROM NEW.current_price)
+  EXECUTE FUNCTION market_price_tick();
+
+DROP TRIGGER IF EXISTS market_price_listed ON market;
+CREATE TRIGGER market_price_listed
+  AFTER INSERT ON market
+  FOR EACH ROW
+  EXECUTE FUNCTION market_price_tick();
+
+-- History starts from the prices in effect now
+SELECT market_price_record(settlement_id, item_id, current_price, LOCALTIMESTAMP)
+FROM market;
@@ -0,0 +1,10 @@
+-- Touched by the API on the primary every REPLICA_LAG_CHECK_INTERVAL (see api/replica.py),
+-- so an idle primary still commits and pg_last_xact_replay_timestamp() on the replica
+-- stays within one interval of now() while replay keeps up.
+
+CREATE TABLE IF NOT EXISTS replica_heartbeat (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  beat_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO replica_heartbeat DEFAULT VALUES ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,10 @@
+-- Cluster-wide bcrypt work factor. The first API instance to start without
+-- BCRYPT_ROUNDS calibrates it and stores it here; every other instance uses the
+-- stored value, so all hosts hash new passwords at the same cost. Delete the row
+-- to recalibrate after a hardware change.
+
+CREATE TABLE IF NOT EXISTS password_settings (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  bcrypt_rounds INT NOT NULL CHECK (bcrypt_rounds BETWEEN 4 AND 31),
+  calibrated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,117 @@
+-- Range-partition market_events by month like events (008), so /market/events only
+-- touches recent partitions and retention drops whole months. The partition helpers
+-- are generalised to any monthly-partitioned table; the events_* functions stay as
+-- wrappers. Safe to re-run: the conversion only happens while market_events is
+-- still a plain table.
+
+-- Create monthly partitions <parent>_pYYYY_MM from p_from's month through p_months_ahead
+-- months past the current one, moving matching rows out of <parent>_default first.
+CREATE OR REPLACE FUNCTION partitions_ensure_monthly(
+  p_parent TEXT,
+  p_months_ahead INT DEFAULT 3,
+  p_from TIMESTAMP DEFAULT LOCALTIMESTAMP
+) RETURNS SETOF TEXT AS $$
+DECLARE
+  month_start TIMESTAMP := date_trunc('month', LEAST(p_from, LOCALTIMESTAMP));
+  last_month TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) + make_interval(months => p_months_ahead);
+  month_end TIMESTAMP;
+  partition_name TEXT;
+BEGIN
+  WHILE month_start <= last_month LOOP
+    month_end := month_start + INTERVAL '1 month';
+    partition_name := p_parent || '_p' || to_char(month_start, 'YYYY_MM');
+
+    IF to_regclass(partition_name) IS NULL THEN
+      EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition_name, p_parent);
+      EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE created_at >= $1 AND created_at < $2 RETURNING *)
+         INSERT INTO %I SELECT * FROM moved', p_parent || '_default', partition_name)
+        USING month_start, month_end;
+      EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                     p_parent, partition_name, month_start, month_end);
+      RETURN NEXT partition_name;
+    END IF;
+
+    month_start := month_end;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach and drop monthly partitions of p_parent whose whole range is older than
+-- p_retain_months full months before the current one. Returns the dropped names.
+CREATE OR REPLACE FUNCTION partitions_drop_monthly(p_parent TEXT, p_retain_months INT)
+RETURNS SETOF TEXT AS $$
+DECLARE
+  cutoff TIMESTAMP := date_trunc('month', LOCALTIMESTAMP) - make_interval(months => p_retain_months);
+  partition_name TEXT;
+BEGIN
+  FOR partition_name IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = p_parent::regclass
+      AND c.relname = p_parent || '_p' || right(c.relname, 7)
+      AND right(c.relname, 7) ~ '^[0-9]{4}_[0-9]{2}$'
+      AND to_timestamp(right(c.relname, 7), 'YYYY_MM')::timestamp + INTERVAL '1 month' <= cutoff
+    ORDER BY c.relname
+  LOOP
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p_parent, partition_name);
+    EXECUTE format('DROP TABLE %I', partition_name);
+    RETURN NEXT partition_name;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION events_ensure_partitions(
+  p_months_ahead INT DEFAULT 3,
+  p_from TIMESTAMP DEFAULT LOCALTIMESTAMP
+) RETURNS SETOF TEXT AS $$
+  SELECT partitions_ensure_monthly('events', p_months_ahead, p_from);
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION events_drop_partitions(p_retain_months INT)
+RETURNS SETOF TEXT AS $$
+  SELECT partitions_drop_monthly('events', p_retain_months);
+$$ LANGUAGE sql;
+
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('market_events')) <> 'p' THEN
+    ALTER TABLE market_events RENAME TO market_events_unpartitioned;
+    ALTER TABLE market_events_unpartitioned
+      RENAME CONSTRAINT market_events_pkey TO market_events_unpartitioned_pkey;
+    ALTER INDEX IF EXISTS idx_market_events_settlement_created
+      RENAME TO idx_market_events_unpartitioned_settlement;
+    ALTER SEQUENCE market_events_market_event_id_seq OWNED BY NONE;
+
+    -- The partition key must be part of the primary key
+    CREATE TABLE market_events (
+      market_event_id BIGINT NOT NULL DEFAULT nextval('market_events_market_event_id_seq'),
+      settlement_id INT NOT NULL,
+      event_type TEXT NOT NULL,
+      price_changes JSONB NOT NULL DEFAULT '{}'::jsonb,
+      client_timestamp DOUBLE PRECISION,
+      created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+      PRIMARY KEY (market_event_id, created_at)
+    ) PARTITION BY RANGE (created_at);
+
+    ALTER SEQUENCE market_events_market_event_id_seq OWNED BY market_events.market_event_id;
+
+    CREATE TABLE market_events_default PARTITION OF market_events DEFAULT;
+
+    PERFORM partitions_ensure_monthly('market_events', 3,
+      COALESCE((SELECT MIN(created_at) FROM market_events_unpartitioned), LOCALTIMESTAMP));
+
+    INSERT INTO market_events (market_event_id, settlement_id, event_type, price_changes,
+                               client_timestamp, created_at)
+    SELECT market_event_id, settlement_id, event_type, price_changes, client_timestamp, created_at
+    FROM market_events_unpartitioned;
+
+    DROP TABLE market_events_unpartitioned;
+  END IF;
+END;
+$$;
+
+-- Cascades to every partition, including ones created later
+CREATE INDEX IF NOT EXISTS idx_market_events_settlement_created
+  ON market_events(settlement_id, created_at DESC);
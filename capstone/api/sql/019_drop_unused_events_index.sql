@@ -0,0 +1,7 @@
+-- GET /market/events reads market_events (009) by its typed settlement_id column, so
+-- nothing queries events by (type, payload settlement_id) any more. The expression
+-- index from 007, recreated on every events partition by 008, only slowed inserts.
+-- A partitioned index cannot be dropped CONCURRENTLY; dropping it takes a brief
+-- ACCESS EXCLUSIVE lock on events and its partitions.
+
+DROP INDEX IF EXISTS idx_events_type_settlement_created;
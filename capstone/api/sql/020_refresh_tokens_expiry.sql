@@ -0,0 +1,7 @@
+-- migrate:no-transaction
+-- RefreshTokenPurger (api/refresh_tokens.py) deletes expired refresh tokens in batches;
+-- this lets each batch find them without scanning every live session.
+-- Built CONCURRENTLY so logins and refreshes are not blocked.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_refresh_tokens_expires
+  ON refresh_tokens(expires_at);
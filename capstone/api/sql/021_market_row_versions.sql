@@ -0,0 +1,76 @@
+-- Market versions move from one market_versions row per settlement (010) onto the market
+-- rows themselves. 010's trigger rewrote the settlement's market_versions row at every
+-- commit that changed its market, so concurrent buys in one settlement queued on that
+-- row. Now a BEFORE trigger stamps the changed row with the next market_version_seq
+-- value while its writer already holds that row's lock, and nothing else is written.
+-- The next writer of a row waits for that lock, so a row's versions grow in commit
+-- order and '<settlement_id>:<item_id>:<version>' tells the API's snapshot cache
+-- whether a snapshot already contains the change (see api/market_cache.py).
+
+DROP TRIGGER IF EXISTS market_version_changed ON market;
+DROP TRIGGER IF EXISTS market_version_inserted_deleted ON market;
+DROP TRIGGER IF EXISTS items_market_version_changed ON items;
+DROP FUNCTION IF EXISTS market_bump_version();
+DROP FUNCTION IF EXISTS market_bump_all_versions();
+DROP TABLE IF EXISTS market_versions;
+
+CREATE SEQUENCE IF NOT EXISTS market_version_seq;
+
+-- The volatile default gives every existing row its own version
+ALTER TABLE market ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('market_version_seq');
+
+CREATE OR REPLACE FUNCTION market_stamp_version() RETURNS trigger AS $$
+BEGIN
+  NEW.version := nextval('market_version_seq');
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS market_version_stamp ON market;
+CREATE TRIGGER market_version_stamp
+  BEFORE UPDATE ON market
+  FOR EACH ROW
+  WHEN (OLD.current_price IS DISTINCT FROM NEW.current_price
+        OR OLD.qty_available IS DISTINCT FROM NEW.qty_available)
+  EXECUTE FUNCTION market_stamp_version();
+
+-- Notifications are delivered at commit; a delete has no row version left to compare,
+-- so it has every cache start over
+CREATE OR REPLACE FUNCTION market_notify_change() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM pg_notify('market_changed', '*');
+  ELSE
+    PERFORM pg_notify('market_changed',
+                      NEW.settlement_id || ':' || NEW.item_id || ':' || NEW.version);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER market_version_changed
+  AFTER UPDATE ON market
+  FOR EACH ROW
+  WHEN (OLD.version IS DISTINCT FROM NEW.version)
+  EXECUTE FUNCTION market_notify_change();
+
+CREATE TRIGGER market_version_inserted_deleted
+  AFTER INSERT OR DELETE ON market
+  FOR EACH ROW
+  EXECUTE FUNCTION market_notify_change();
+
+-- Snapshots include item names, so a rename restamps the item's market rows (new ETags)
+-- and invalidates every cached settlement
+CREATE OR REPLACE FUNCTION market_item_renamed() RETURNS trigger AS $$
+BEGIN
+  UPDATE market SET version = nextval('market_version_seq') WHERE item_id = NEW.item_id;
+  PERFORM pg_notify('market_changed', '*');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_market_version_changed
+  AFTER UPDATE OF name ON items
+  FOR EACH ROW
+  WHEN (OLD.name IS DISTINCT FROM NEW.name)
+  EXECUTE FUNCTION market_item_renamed();
@@ -0,0 +1,307 @@
+"""
+Prepared statement registry for Dizzy's Disease API
+Hot SQL is declared once here and prepared on every pooled connection by the pool's
+init callback, so endpoints execute it by name without per-request parse/plan work.
+"""
+
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict
+
+import asyncpg
+
+from .error_handling import request_db_stats, structured_logger
+from .metrics import registry
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+STATEMENTS: Dict[str, str] = {
+    # Authentication
+    "user_by_email": """
+        SELECT user_id, email, display_name, password_hash FROM users WHERE email = $1
+    """,
+    "user_email_verified": """
+        SELECT email_verified FROM users WHERE user_id = $1
+    """,
+    "refresh_token_rotate": """
+        WITH used AS (
+            UPDATE refresh_tokens
+            SET revoked_at = NOW()
+            WHERE token_hash = $1 AND revoked_at IS NULL AND expires_at > NOW()
+            RETURNING user_id, family_id
+        ), issued AS (
+            INSERT INTO refresh_tokens (user_id, token_hash, family_id, expires_at)
+            SELECT user_id, $2, family_id, $3 FROM used
+            RETURNING user_id
+        )
+        SELECT u.user_id, u.email, u.display_name
+        FROM issued JOIN users u ON u.user_id = issued.user_id
+    """,
+    # Replaying an already revoked token means it leaked: revoke the rest of its family
+    "refresh_token_family_revoke": """
+        UPDATE refresh_tokens
+        SET revoked_at = NOW()
+        WHERE family_id = (
+            SELECT family_id FROM refresh_tokens
+            WHERE token_hash = $1 AND revoked_at IS NOT NULL
+        ) AND revoked_at IS NULL
+        RETURNING family_id
+    """,
+    "refresh_tokens_revoke_user": """
+        UPDATE refresh_tokens SET revoked_at = NOW() WHERE user_id = $1 AND revoked_at IS NULL
+    """,
+    # Revoked rows are kept until they expire so a replay can still be detected
+    "refresh_tokens_purge_expired": """
+        DELETE FROM refresh_tokens
+        WHERE token_id IN (
+            SELECT token_id FROM refresh_tokens
+            WHERE expires_at < NOW()
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+    """,
+    "flush_last_login": """
+        UPDATE users AS u
+        SET last_login = v.last_login
+        FROM unnest($1::int[], $2::timestamptz[]) AS v(user_id, last_login)
+        WHERE u.user_id = v.user_id
+          AND (u.last_login IS NULL OR u.last_login < v.last_login)
+    """,
+
+    # bcrypt work factor shared by every instance (sql/017_password_settings.sql)
+    "bcrypt_rounds_get": """
+        SELECT bcrypt_rounds FROM password_settings
+    """,
+    # A concurrent first start waits on the conflict and gets the row the winner committed
+    "bcrypt_rounds_pin": """
+        INSERT INTO password_settings (bcrypt_rounds) VALUES ($1)
+        ON CONFLICT (id) DO UPDATE SET bcrypt_rounds = password_settings.bcrypt_rounds
+        RETURNING bcrypt_rounds
+    """,
+
+    # Item catalog (api/catalog.py)
+    "item_catalog": """
+        SELECT item_id, name, type, slot_size, weight, durability_max,
+               armor_dr, damage, noise, noise_radius
+        FROM items
+        ORDER BY item_id
+    """,
+
+    # Market reads
+    "market_snapshot": """
+        SELECT m.item_id, i.name, m.current_price, m.qty_available, m.version
+        FROM market m
+        JOIN items i ON m.item_id = i.item_id
+        WHERE m.settlement_id = $1
+        ORDER BY m.item_id
+    """,
+    "market_history": """
+        SELECT bucket, open, high, low, close, ticks
+        FROM market_price_rollups
+        WHERE settlement_id = $1 AND item_id = $2 AND resolution = $3
+        ORDER BY bucket DESC
+        LIMIT $4
+    """,
+    "market_events_recent": """
+        SELECT event_type, price_changes, client_timestamp, created_at
+        FROM market_events
+        WHERE settlement_id = $1
+        AND created_at >= LOCALTIMESTAMP - $3::interval
+        ORDER BY created_at DESC
+        LIMIT $2
+    """,
+
+    # Market purchase, one round trip (sql/013_order_responses.sql)
+    "market_buy": """
+        SELECT status, response FROM market_buy($1, $2, $3, $4, $5)
+    """,
+    "market_buy_batch": """
+        SELECT batch_position, status, response FROM market_buy_batch($1, $2, $3::uuid[], $4::int[], $5::int[])
+    """,
+
+    # Market writes and telemetry
+    "event_insert": """
+        INSERT INTO events (type, payload_json) VALUES ($1, $2)
+    """,
+    "market_event_insert": """
+        INSERT INTO market_events (settlement_id, event_type, price_changes, client_timestamp)
+        VALUES ($1, $2, $3, $4)
+    """,
+    "market_prices_apply": """
+        UPDATE market AS m
+        SET current_price = v.price
+        FROM unnest($2::int[], $3::int[]) AS v(item_id, price)
+        WHERE m.settlement_id = $1 AND m.item_id = v.item_id
+    """,
+
+    # Read replica lag (sql/016_replica_heartbeat.sql)
+    "replica_heartbeat": """
+        UPDATE replica_heartbeat SET beat_at = NOW()
+    """,
+
+    # Characters
+    "characters_by_user": """
+        SELECT
+            character_id, name, level, xp, strength, dexterity, agility,
+            endurance, accuracy, money, available_stat_points,
+            proficiency_melee, proficiency_axes_clubs, proficiency_pistols,
+            proficiency_rifles, proficiency_shotguns, proficiency_automatics,
+            survivability_health, survivability_stamina,
+            nourishment_level, sleep_level,
+            is_legacy_auto_created,
+            created_at
+        FROM characters
+        WHERE user_id = $1
+        ORDER BY created_at ASC
+    """,
+    "character_count": """
+        SELECT COUNT(*) FROM characters WHERE user_id = $1
+    """,
+    "character_name_taken": """
+        SELECT character_id FROM characters WHERE user_id = $1 AND name = $2
+    """,
+}
+
+STATEMENT_NAMES: Dict[str, str] = {sql: name for name, sql in STATEMENTS.items()}
+
+_query_seconds = registry.histogram(
+    "db_query_seconds", "Query execution time by registry name or SQL fingerprint", ["statement"])
+_query_errors = registry.counter(
+    "db_query_errors_total", "Queries that raised, by registry name or SQL fingerprint", ["statement"])
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w$])\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=512)
+def sql_fingerprint(query: str, max_length: int = 80) -> str:
+    """Stable, low-cardinality label for ad-hoc SQL: literals masked, whitespace collapsed"""
+    name = STATEMENT_NAMES.get(query)
+    if name is not None:
+        return name
+    normalized = _WHITESPACE.sub(" ", _LITERALS.sub("?", query)).strip()
+    return normalized[:max_length]
+
+
+def _status_rows(status: str) -> int:
+    # Command tags end in the affected row count: "UPDATE 3", "INSERT 0 1"; BEGIN etc. have none
+    tail = status.rsplit(" ", 1)[-1] if status else ""
+    return int(tail) if tail.isdigit() else 0
+
+
+# asyncpg sends transaction control for conn.transaction() through execute(); not application work
+_TRANSACTION_CONTROL = re.compile(
+    r"^\s*(BEGIN|START\s+TRANSACTION|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+
+
+def _record_query(query: str, elapsed: float, rows: int, failed: bool) -> None:
+    statement = sql_fingerprint(query)
+    _query_seconds.observe(elapsed, statement=statement)
+    if failed:
+        _query_errors.inc(statement=statement)
+
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.rows += rows
+        stats.seconds += elapsed
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        structured_logger.log_event("slow_query", {
+            "statement": statement,
+            "duration_ms": round(elapsed * 1000, 2),
+            "rows": rows,
+            "failed": failed,
+            "threshold_ms": SLOW_QUERY_MS
+        }, level="WARNING", correlation_id=stats.correlation_id if stats else None)
+
+
+class PreparedConnection(asyncpg.Connection):
+    """Pooled connection that executes registry statements by name and times every query.
+
+    Each query's duration and row count are charged to the current request (see
+    RequestDbStats) and logged when slower than SLOW_QUERY_MS. The BEGIN/COMMIT that
+    asyncpg issues for transaction blocks and the reset it runs on pool release are
+    not application queries and are not timed. Registry statements are prepared when
+    the connection is opened and live in its own statement cache, which survives pool
+    release and is sized by DB_STATEMENT_CACHE_SIZE, so each one is parsed and planned
+    once per physical connection.
+    """
+
+    async def prepare_registry(self) -> None:
+        """Prepare every registry statement into the statement cache without running it.
+
+        PreparedStatement handles from prepare() stop working once the connection goes
+        back to the pool, so the cache is primed instead: executemany() with no argument
+        rows parses, plans and caches a statement but never executes it. A statement
+        whose tables or functions do not exist yet (migrations pending) is skipped and
+        logged, and is prepared on first use instead.
+        """
+        for name, sql in STATEMENTS.items():
+            try:
+                await super().executemany(sql, [])
+            except asyncpg.PostgresError as e:
+                structured_logger.log_event("statement_prepare_skipped", {
+                    "statement": name,
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }, level="WARNING")
+
+    _resetting = False
+
+    async def reset(self, *, timeout=None):
+        self._resetting = True
+        try:
+            await super().reset(timeout=timeout)
+        finally:
+            self._resetting = False
+
+    async def _timed(self, query: str, call, row_count) -> Any:
+        started_at = time.perf_counter()
+        result, failed = None, True
+        try:
+            result = await call
+            failed = False
+            return result
+        finally:
+            _record_query(query, time.perf_counter() - started_at,
+                          0 if failed else row_count(result), failed)
+
+    async def fetch(self, query, *args, **kwargs):
+        return await self._timed(query, super().fetch(query, *args, **kwargs), len)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self._timed(query, super().fetchrow(query, *args, **kwargs),
+                                 lambda row: 0 if row is None else 1)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self._timed(query, super().fetchval(query, *args, **kwargs),
+                                 lambda value: 0 if value is None else 1)
+
+    async def execute(self, query, *args, **kwargs):
+        if self._resetting or _TRANSACTION_CONTROL.match(query):
+            return await super().execute(query, *args, **kwargs)
+        return await self._timed(query, super().execute(query, *args, **kwargs), _status_rows)
+
+    async def executemany(self, command, args, **kwargs):
+        return await self._timed(command, super().executemany(command, args, **kwargs),
+                                 lambda _: len(args))
+
+    async def fetch_named(self, name: str, *args) -> list:
+        return await self.fetch(STATEMENTS[name], *args)
+
+    async def fetchrow_named(self, name: str, *args):
+        return await self.fetchrow(STATEMENTS[name], *args)
+
+    async def fetchval_named(self, name: str, *args):
+        return await self.fetchval(STATEMENTS[name], *args)
+
+    async def execute_named(self, name: str, *args) -> str:
+        return await self.execute(STATEMENTS[name], *args)
+
+
+async def init_connection(conn: PreparedConnection) -> None:
+    """Pool init callback: runs once for every new physical connection"""
+    await conn.prepare_registry()
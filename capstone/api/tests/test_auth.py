@@ -58,3 +58,47 @@ async def test_password_reset_flow():
         r = await c.post("/auth/login", json={"email": email, "password": new_password})
         assert r.status_code == 200
         assert r.json()["user"]["display_name"] == "Reset User"
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        email = f"refresh_{os.urandom(2).hex()}@example.com"
+        r = await c.post("/auth/register", json={"email": email, "password": "Pass1234!", "display_name": "R"})
+        assert r.status_code == 200
+        first_refresh = r.json()["refresh_token"]
+        assert first_refresh
+
+        # Renewing returns a fresh access token and a rotated refresh token
+        r = await c.post("/auth/refresh", json={"refresh_token": first_refresh})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["token"]
+        assert body["user"]["email"] == email
+        second_refresh = body["refresh_token"]
+        assert second_refresh != first_refresh
+
+        r = await c.get("/characters", headers={"Authorization": f"Bearer {body['token']}"})
+        assert r.status_code == 200
+
+        # Replaying a rotated token fails and revokes the whole family
+        r = await c.post("/auth/refresh", json={"refresh_token": first_refresh})
+        assert r.status_code == 401
+        r = await c.post("/auth/refresh", json={"refresh_token": second_refresh})
+        assert r.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_login_attempts_are_throttled_per_email():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        email = f"throttle_{os.urandom(3).hex()}@example.com"
+        statuses = []
+        for _ in range(15):
+            r = await c.post("/auth/login", json={"email": email, "password": "WrongPass1!"})
+            statuses.append(r.status_code)
+            if r.status_code == 429:
+                assert int(r.headers["Retry-After"]) >= 1
+                assert r.json()["error"]["code"] == "RATE_LIMITED"
+                break
+        assert statuses[0] == 401
+        assert statuses[-1] == 429
@@ -0,0 +1,54 @@
+import asyncpg
+import json
+import os
+import pytest
+
+DB = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/dizzy")
+
+# Hot queries (with representative literals) and the index each must use
+HOT_QUERIES = [
+    ("SELECT current_price, qty_available FROM market "
+     "WHERE settlement_id = 1 AND item_id = 1 FOR UPDATE",
+     "idx_market_settlement_item"),
+    ("SELECT event_type, price_changes, created_at FROM market_events "
+     "WHERE settlement_id = 1 ORDER BY created_at DESC LIMIT 10",
+     "idx_market_events_settlement_created"),
+    ("SELECT character_id, name FROM characters WHERE user_id = 1 ORDER BY created_at ASC",
+     "idx_characters_user_created"),
+    ("SELECT item_id, quantity FROM inventories WHERE character_id = 1",
+     "idx_inventories_character"),
+    ("SELECT bucket, open, high, low, close FROM market_price_rollups "
+     "WHERE settlement_id = 1 AND item_id = 1 AND resolution = 'hour' ORDER BY bucket DESC LIMIT 100",
+     "market_price_rollups_pkey"),
+]
+
+async def _index_and_partition_indexes(conn, index_name):
+    # On a partitioned table the plan names each partition's child index
+    rows = await conn.fetch("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass($1)
+    """, index_name)
+    return {index_name} | {row["relname"] for row in rows}
+
+def _index_names(plan):
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query,index_name", HOT_QUERIES)
+async def test_hot_query_uses_index(query, index_name):
+    conn = await asyncpg.connect(DB)
+    try:
+        # Seed tables are tiny; take sequential scans off the table so the planner shows
+        # which index it would use at production sizes
+        await conn.execute("SET enable_seqscan = off")
+        plan = json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}"))[0]["Plan"]
+        expected = await _index_and_partition_indexes(conn, index_name)
+        assert expected & _index_names(plan), json.dumps(plan, indent=2)
+    finally:
+        await conn.close()
@@ -0,0 +1,49 @@
+import asyncio
+import asyncpg
+import httpx
+import os
+import pytest
+
+BASE = os.getenv("API_BASE", "http://api:8000")
+DB = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/dizzy")
+
+@pytest.mark.asyncio
+async def test_items_catalog_etag_and_type_filter():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        r = await c.get("/items")
+        assert r.status_code == 200
+        items = r.json()["items"]
+        assert len(items) >= 1
+        etag = r.headers["ETag"]
+
+        r = await c.get("/items", headers={"If-None-Match": etag})
+        assert r.status_code == 304
+
+        item_type = items[0]["type"]
+        r = await c.get("/items", params={"type": item_type})
+        assert r.status_code == 200
+        typed = r.json()["items"]
+        assert typed and all(item["type"] == item_type for item in typed)
+        assert r.headers["ETag"] != etag
+
+@pytest.mark.asyncio
+async def test_items_catalog_reloads_on_change():
+    conn = await asyncpg.connect(DB)
+    name = f"Test Crate {os.urandom(3).hex()}"
+    try:
+        async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+            etag = (await c.get("/items")).headers["ETag"]
+            item_id = await conn.fetchval(
+                "INSERT INTO items (name, type) VALUES ($1, 'misc') RETURNING item_id", name)
+
+            # The reload is driven by NOTIFY, so allow it a moment
+            for _ in range(20):
+                r = await c.get("/items", headers={"If-None-Match": etag})
+                if r.status_code == 200:
+                    break
+                await asyncio.sleep(0.1)
+            assert r.status_code == 200
+            assert any(item["item_id"] == item_id and item["name"] == name for item in r.json()["items"])
+    finally:
+        await conn.execute("DELETE FROM items WHERE name = $1", name)
+        await conn.close()
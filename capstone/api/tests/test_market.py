@@ -1,8 +1,12 @@
+import asyncio
+import asyncpg
 import httpx
 import os
+import uuid
 import pytest
 
 BASE = os.getenv("API_BASE", "http://api:8000")
+DB = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/dizzy")
 
 async def _register(c):
     email = f"test_{os.urandom(2).hex()}@example.com"
@@ -29,3 +33,179 @@ async def test_market_list_and_buy():
         }
         r = await c.post("/market/buy", headers=headers, json={"settlement_id":1, "item_id": item_id, "quantity":1})
         assert r.status_code == 200
+
+@pytest.mark.asyncio
+async def test_market_prices_etag_revalidation():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        token, password, email = await _register(c)
+        r = await c.get("/market/prices", params={"settlement_id": 1})
+        assert r.status_code == 200
+        etag = r.headers["ETag"]
+        item = r.json()["items"][0]
+
+        r = await c.get("/market/prices", params={"settlement_id": 1}, headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.headers["ETag"] == etag
+
+        new_price = item["price"] + 1
+        r = await c.post("/market/events", headers={"Authorization": f"Bearer {token}"}, json={
+            "event_type": "price_update",
+            "settlement_id": 1,
+            "price_changes": {item["name"]: {"old": item["price"], "new": new_price}},
+            "timestamp": 1.0
+        })
+        assert r.status_code == 200
+
+        # Invalidation arrives by NOTIFY, so allow it a moment
+        for _ in range(20):
+            r = await c.get("/market/prices", params={"settlement_id": 1}, headers={"If-None-Match": etag})
+            if r.status_code == 200:
+                break
+            await asyncio.sleep(0.1)
+        assert r.status_code == 200
+        assert r.headers["ETag"] != etag
+        assert r.json()["prices"][item["name"]] == new_price
+
+@pytest.mark.asyncio
+async def test_market_buy_with_character_is_idempotent():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        token, password, email = await _register(c)
+        auth = {"Authorization": f"Bearer {token}"}
+        r = await c.post("/characters", headers=auth, json={
+            "name": f"Buyer{os.urandom(3).hex()}", "strength": 2, "dexterity": 2,
+            "agility": 2, "endurance": 2, "accuracy": 1
+        })
+        assert r.status_code == 200
+
+        r = await c.get("/market", params={"settlement_id": 1})
+        item = min(r.json()["items"], key=lambda i: i["current_price"])
+        order = {"settlement_id": 1, "item_id": item["item_id"], "quantity": 1}
+        headers = {**auth, "X-Request-Id": str(uuid.uuid4())}
+
+        r = await c.post("/market/buy", headers=headers, json=order)
+        assert r.status_code == 200
+        original = r.json()
+        assert original["duplicate"] is False
+        assert original["price"] == item["current_price"]
+
+        # A retry replays the original outcome
+        r = await c.post("/market/buy", headers=headers, json=order)
+        assert r.status_code == 200
+        assert r.json() == {**original, "duplicate": True}
+
+        # Another user reusing the id learns nothing about the order
+        other_token, _, _ = await _register(c)
+        r = await c.post("/market/buy", json=order, headers={
+            "Authorization": f"Bearer {other_token}", "X-Request-Id": headers["X-Request-Id"]
+        })
+        assert r.status_code == 200
+        assert r.json()["duplicate"] is True
+        assert "price" not in r.json()
+
+        r = await c.post("/market/buy", headers={**auth, "X-Request-Id": str(uuid.uuid4())},
+                         json={**order, "quantity": item["qty_available"] + 1})
+        assert r.status_code == 400
+
+@pytest.mark.asyncio
+async def test_concurrent_buys_batch_with_per_request_results():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        token, password, email = await _register(c)
+        auth = {"Authorization": f"Bearer {token}"}
+        r = await c.post("/characters", headers=auth, json={
+            "name": f"Batch{os.urandom(3).hex()}", "strength": 2, "dexterity": 2,
+            "agility": 2, "endurance": 2, "accuracy": 1
+        })
+        assert r.status_code == 200
+
+        r = await c.get("/market", params={"settlement_id": 1})
+        item = min(r.json()["items"], key=lambda i: i["current_price"])
+        order = {"settlement_id": 1, "item_id": item["item_id"], "quantity": 1}
+        request_ids = [str(uuid.uuid4()) for _ in range(3)]
+        request_ids.append(request_ids[0])
+
+        responses = await asyncio.gather(*(
+            c.post("/market/buy", headers={**auth, "X-Request-Id": request_id}, json=order)
+            for request_id in request_ids
+        ))
+        assert [r.status_code for r in responses] == [200] * 4
+        assert sum(r.json()["duplicate"] for r in responses) == 1
+
+        r = await c.post("/market/buy", headers={**auth, "X-Request-Id": "not-a-uuid"}, json=order)
+        assert r.status_code == 400
+
+@pytest.mark.asyncio
+async def test_failing_buy_does_not_fail_its_batch():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        token, password, email = await _register(c)
+        auth = {"Authorization": f"Bearer {token}"}
+        r = await c.post("/characters", headers=auth, json={
+            "name": f"Rich{os.urandom(3).hex()}", "strength": 2, "dexterity": 2,
+            "agility": 2, "endurance": 2, "accuracy": 1
+        })
+        assert r.status_code == 200
+
+        r = await c.get("/market", params={"settlement_id": 1})
+        item = min(r.json()["items"], key=lambda i: i["current_price"])
+        conn = await asyncpg.connect(DB)
+        try:
+            # Priced so that buying 10000 overflows the integer total and the statement raises
+            await conn.execute(
+                "UPDATE market SET current_price = 1000000, qty_available = 100000 "
+                "WHERE settlement_id = 1 AND item_id = $1", item["item_id"])
+            await conn.execute(
+                "UPDATE characters SET money = 10000000 "
+                "WHERE user_id = (SELECT user_id FROM users WHERE email = $1)", email)
+
+            quantities = [1, 1, 10000, 1]
+            responses = await asyncio.gather(*(
+                c.post("/market/buy", headers={**auth, "X-Request-Id": str(uuid.uuid4())},
+                       json={"settlement_id": 1, "item_id": item["item_id"], "quantity": quantity})
+                for quantity in quantities
+            ))
+            assert [r.status_code == 200 for r in responses] == [True, True, False, True]
+            assert not any(r.json()["duplicate"] for r in responses if r.status_code == 200)
+        finally:
+            await conn.execute(
+                "UPDATE market SET current_price = $2, qty_available = $3 "
+                "WHERE settlement_id = 1 AND item_id = $1",
+                item["item_id"], item["current_price"], item["qty_available"])
+            await conn.close()
+
+@pytest.mark.asyncio
+async def test_market_history_rollups_follow_price_changes():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        token, password, email = await _register(c)
+        r = await c.get("/market/prices", params={"settlement_id": 1})
+        item = r.json()["items"][-1]
+        r = await c.get("/market", params={"settlement_id": 1})
+        item_id = r.json()["items"][-1]["item_id"]
+
+        async def set_price(new_price):
+            r = await c.post("/market/events", headers={"Authorization": f"Bearer {token}"}, json={
+                "event_type": "price_update",
+                "settlement_id": 1,
+                "price_changes": {item["name"]: {"old": item["price"], "new": new_price}},
+                "timestamp": 1.0
+            })
+            assert r.status_code == 200
+
+        try:
+            await set_price(item["price"] + 7)
+            await set_price(item["price"] + 3)
+
+            for resolution in ("minute", "hour", "day"):
+                r = await c.get("/market/history", params={
+                    "settlement_id": 1, "item_id": item_id, "resolution": resolution
+                })
+                assert r.status_code == 200
+                candle = r.json()["candles"][-1]
+                assert candle["high"] >= item["price"] + 7
+                assert candle["close"] == item["price"] + 3
+                assert candle["low"] <= candle["close"] <= candle["high"]
+        finally:
+            await set_price(item["price"])
+
+        r = await c.get("/market/history", params={"item_id": item_id, "resolution": "week"})
+        assert r.status_code == 400
+        r = await c.get("/market/history", params={"settlement_id": 1})
+        assert r.status_code == 422
@@ -0,0 +1,47 @@
+import httpx
+import os
+import pytest
+
+BASE = os.getenv("API_BASE", "http://api:8000")
+
+def _samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+@pytest.mark.asyncio
+async def test_metrics_prometheus_exposition():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        r = await c.get("/market", params={"settlement_id": 1})
+        assert r.status_code == 200
+
+        r = await c.get("/metrics")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/plain")
+        text = r.text
+        assert "# TYPE http_request_duration_seconds histogram" in text
+        assert "# TYPE db_pool_acquire_seconds histogram" in text
+
+        samples = _samples(text)
+        assert samples['db_pool_size{pool="primary"}'] >= 1
+        assert samples['db_pool_in_use{pool="primary"}'] >= 0
+        assert samples['db_pool_acquire_seconds_count{pool="primary"}'] >= 1
+        assert samples['http_request_duration_seconds_count{method="GET",route="/market",status="200"}'] >= 1
+        assert samples['db_query_seconds_count{statement="market_snapshot"}'] >= 1
+        assert 'http_request_duration_seconds_bucket{method="GET",route="/market",status="200",le="+Inf"}' in samples
+
+@pytest.mark.asyncio
+async def test_metrics_skip_asyncpg_internal_queries():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        # The snapshot load runs in a transaction and releases its connection back to the pool
+        r = await c.get("/market", params={"settlement_id": 1})
+        assert r.status_code == 200
+
+        r = await c.get("/metrics")
+        statements = [line for line in r.text.splitlines() if line.startswith("db_query_seconds_count{")]
+        assert statements
+        for internal in ("BEGIN", "COMMIT", "ROLLBACK", "SELECT pg_advisory_unlock_all()"):
+            assert not any(f'statement="{internal}' in line for line in statements), internal
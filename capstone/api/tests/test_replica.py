@@ -0,0 +1,23 @@
+import httpx
+import os
+import pytest
+
+BASE = os.getenv("API_BASE", "http://api:8000")
+
+@pytest.mark.asyncio
+async def test_health_reports_read_routing():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        r = await c.get("/health")
+        assert r.status_code == 200
+        replica = r.json()["replica"]
+        if replica["configured"]:
+            assert replica["routing"] in ("replica", "primary")
+            if replica["routing"] == "replica":
+                assert replica["lag_seconds"] <= replica["max_lag_seconds"]
+
+@pytest.mark.asyncio
+async def test_read_endpoints_serve_regardless_of_routing():
+    async with httpx.AsyncClient(base_url=BASE, timeout=10.0) as c:
+        for path in ("/market", "/market/prices", "/market/events"):
+            r = await c.get(path, params={"settlement_id": 1})
+            assert r.status_code == 200, path
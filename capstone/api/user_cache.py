@@ -0,0 +1,75 @@
+"""
+Per-process cache of users.email_verified for Dizzy's Disease API
+Entries expire after a TTL and are invalidated by the users_notify_changed trigger
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .metrics import registry
+
+EMAIL_VERIFIED_CACHE_TTL = float(os.getenv("EMAIL_VERIFIED_CACHE_TTL", "300"))
+EMAIL_VERIFIED_CACHE_SIZE = int(os.getenv("EMAIL_VERIFIED_CACHE_SIZE", "50000"))
+
+USER_CHANGED_CHANNEL = "user_changed"
+
+
+class EmailVerificationCache:
+    """TTL and LRU cache of email verification status keyed by user_id"""
+
+    def __init__(self, ttl: float = EMAIL_VERIFIED_CACHE_TTL, max_size: int = EMAIL_VERIFIED_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[float, bool]]" = OrderedDict()
+        # Bumped on every invalidation so a lookup racing with a NOTIFY cannot
+        # store the value it read before the change
+        self._generation = 0
+
+        self._lookups = registry.counter(
+            "email_verified_cache_lookups_total", "Email verification lookups by result", ["result"])
+        self._invalidations = registry.counter(
+            "email_verified_cache_invalidations_total", "Entries invalidated by users_notify_changed")
+        registry.gauge("email_verified_cache_entries", "Cached email verification entries",
+                       callback=lambda: len(self._entries))
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: int) -> Optional[bool]:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, verified = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(user_id)
+                self._lookups.inc(result="hit")
+                return verified
+            del self._entries[user_id]
+        self._lookups.inc(result="miss")
+        return None
+
+    def put(self, user_id: int, verified: bool, generation: int) -> None:
+        if generation != self._generation:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, verified)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, payload: str) -> None:
+        """NOTIFY handler; payload is the changed user_id"""
+        self._generation += 1
+        self._invalidations.inc()
+        try:
+            self._entries.pop(int(payload), None)
+        except ValueError:
+            self._entries.clear()
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+
+email_verified_cache = EmailVerificationCache()
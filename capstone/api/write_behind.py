@@ -0,0 +1,160 @@
+"""
+Write-behind buffering for low-value column updates in Dizzy's Disease API
+Coalesces users.last_login writes off the login request path
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import asyncpg
+
+from .error_handling import structured_logger
+from .metrics import registry
+
+LAST_LOGIN_FLUSH_INTERVAL = float(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", "5"))
+LAST_LOGIN_MAX_PENDING = int(os.getenv("LAST_LOGIN_MAX_PENDING", "5000"))
+LAST_LOGIN_SHUTDOWN_TIMEOUT = float(os.getenv("LAST_LOGIN_SHUTDOWN_TIMEOUT", "5"))
+LAST_LOGIN_MAX_BACKOFF = float(os.getenv("LAST_LOGIN_MAX_BACKOFF", "60"))
+
+
+class LastLoginWriter:
+    """Collects last-login timestamps in memory and writes them in one UPDATE per interval.
+
+    Loss is bounded: at most one flush interval (or LAST_LOGIN_MAX_PENDING users) of
+    timestamps is at risk, and shutdown lets an in-flight flush finish, then performs a
+    final flush before the pool closes. Anything still unwritten is counted as dropped.
+    After a failed flush the next attempt waits twice as long each time, up to
+    LAST_LOGIN_MAX_BACKOFF, and a full buffer does not cut that wait short.
+    """
+
+    def __init__(self, pool_getter: Callable[[], Awaitable[asyncpg.Pool]],
+                 interval: float = LAST_LOGIN_FLUSH_INTERVAL,
+                 max_pending: int = LAST_LOGIN_MAX_PENDING,
+                 shutdown_timeout: float = LAST_LOGIN_SHUTDOWN_TIMEOUT,
+                 max_backoff: float = LAST_LOGIN_MAX_BACKOFF):
+        self._pool_getter = pool_getter
+        self.interval = interval
+        self.max_pending = max_pending
+        self.shutdown_timeout = shutdown_timeout
+        self.max_backoff = max_backoff
+        self._pending: Dict[int, datetime] = {}
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        self._consecutive_failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self._flush_seconds = registry.histogram(
+            "last_login_flush_seconds", "Latency of the batched users.last_login UPDATE")
+        self._flushed = registry.counter(
+            "last_login_flushed_total", "last_login values written by the write-behind flusher")
+        self._failures = registry.counter(
+            "last_login_flush_failures_total", "Batched last_login writes that failed and were requeued")
+        self._dropped = registry.counter(
+            "last_login_dropped_total", "last_login values discarded (overflow or shutdown timeout)")
+        registry.gauge("last_login_pending", "Users with an unflushed last_login",
+                       callback=lambda: len(self._pending))
+
+    def record(self, user_id: int, at: datetime) -> None:
+        current = self._pending.get(user_id)
+        if current is None and len(self._pending) >= self.max_pending:
+            # Flushes are not keeping up (database slow or down): drop rather than grow
+            self._dropped.inc()
+            self._wake.set()
+            return
+        if current is None or at > current:
+            self._pending[user_id] = at
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Signal the loop instead of cancelling it, so a flush already running completes
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task or self.flush(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task = None
+        if self._pending:
+            self._dropped.inc(len(self._pending))
+            structured_logger.log_event("last_login_flush_incomplete", {
+                "dropped": len(self._pending)
+            }, level="WARNING")
+            self._pending.clear()
+
+    def _next_delay(self) -> float:
+        if not self._consecutive_failures:
+            return self.interval
+        return min(self.interval * 2 ** self._consecutive_failures, self.max_backoff)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            deadline = time.monotonic() + self._next_delay()
+            while not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._wake.clear()
+                if not self._consecutive_failures:
+                    # Buffer full: flush early. While backing off, a requeued batch that
+                    # refills the buffer must not turn retries into a hot loop.
+                    break
+            if self._stopping:
+                break
+            self._wake.clear()
+            await self.flush()
+        # Final flush for whatever is pending when stop() is signalled
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write every pending timestamp in a single statement; returns rows submitted"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+
+            started_at = time.perf_counter()
+            try:
+                pool = await self._pool_getter()
+                async with pool.acquire() as conn:
+                    await conn.execute_named(
+                        "flush_last_login", list(batch.keys()), list(batch.values())
+                    )
+            except asyncio.CancelledError:
+                # Shutdown timed out mid-write: keep the batch so stop() accounts for it
+                self._requeue(batch)
+                raise
+            except Exception as e:
+                self._failures.inc()
+                self._consecutive_failures += 1
+                self._requeue(batch)
+                structured_logger.log_event("last_login_flush_failed", {
+                    "batch_size": len(batch),
+                    "retry_in_seconds": self._next_delay(),
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)
+                }, level="ERROR")
+                return 0
+            finally:
+                self._flush_seconds.observe(time.perf_counter() - started_at)
+
+            self._consecutive_failures = 0
+            self._flushed.inc(len(batch))
+            return len(batch)
+
+    def _requeue(self, batch: Dict[int, datetime]) -> None:
+        for user_id, at in batch.items():
+            self.record(user_id, at)